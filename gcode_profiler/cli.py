@@ -1,28 +1,96 @@
 import argparse
+import os
 import sys
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import mmap
 from pathlib import Path
 import hashlib
 import json
 import re
 
-from .config_ini import parse_config_ini, config_get_float
+# orjson (Rust) serializes several times faster than stdlib json and writes
+# bytes directly; fall back to json when it isn't installed.
+try:
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None
+
+from .config_ini import ConfigInfo
 from .constants import DEFAULT_BINS, DEFAULT_FILAMENT_DIAMETER_MM, DEFAULT_TOP_N_SLOWEST
 from .gcode_parser import parse_gcode
-from .excel_writer import write_xlsx, write_csv_exports, build_json_summary
+
+# NOTE: .excel_writer (and with it openpyxl, by far the slowest import in the
+# tree) is imported lazily inside main() so `--help` and argparse errors don't
+# pay its cold-start cost.
 
 _T0 = time.time()
+_last_emit = 0.0
+
+# Precompiled patterns for make_profile_label (avoids re-cache lookups per run).
+_HF_RE = re.compile(r"(HF\s*\d+(?:\.\d+)?)", re.IGNORECASE)
+_NONALPHA_RE = re.compile(r"[^A-Za-z]+")
 
 
 def status(msg: str, enabled: bool = True):
-    """Emit a lightweight progress message to stderr."""
+    """Emit a lightweight progress message to stderr.
+
+    Rate-limited to ~10 messages/s so high-frequency parse progress doesn't
+    burn a syscall per update; "Done" messages always print.
+    """
+    global _last_emit
     if not enabled:
         return
+    now = time.monotonic()
+    if now - _last_emit < 0.1 and not msg.startswith("Done"):
+        return
+    _last_emit = now
     dt = time.time() - _T0
-    print(f"[{dt:6.1f}s] {msg}", file=sys.stderr, flush=True)
+    print(f"[{dt:6.1f}s] {msg}", file=sys.stderr)
+
+
+def sha256_file(path, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 hex digest of a file.
 
+    Prefers mmap so the whole file is fed to OpenSSL's optimized SHA-256 in a
+    single update (no per-chunk Python loop). Falls back to 1 MiB chunked
+    reads for empty files or platforms where mmap is unavailable.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                h.update(mm)
+                return h.hexdigest()
+        except (ValueError, OSError):
+            pass
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _dump_json(obj, path):
+    """Write `obj` to `path` as 2-space-indented JSON via the fastest backend."""
+    if orjson is not None:
+        data = orjson.dumps(obj, option=orjson.OPT_INDENT_2, default=str)
+    else:
+        data = json.dumps(obj, indent=2, default=str).encode("utf-8")
+    Path(path).write_bytes(data)
 
-def make_profile_label(cfg_info: dict | None, fallback: str) -> str:
+
+def _parse_worker(path: str, filament_diam: float, want_hash: bool):
+    """Parse one gcode file in a worker process.
+
+    No status callback (cross-process progress is noisy); the parent emits one
+    status line per completed file instead. Returns (moves, layer_z_map,
+    sha256-hexdigest-or-None).
+    """
+    h = hashlib.sha256() if want_hash else None
+    moves, layer_z_map = parse_gcode(path, filament_diam, hasher=h)
+    return moves, layer_z_map, (h.hexdigest() if h else None)
+
+
+def make_profile_label(cfg_info: ConfigInfo | None, fallback: str) -> str:
     """Create a descriptive run label from config.ini fields.
 
     Format: <HF/nozzle>_<layer>_<TAG>
@@ -33,14 +101,14 @@ def make_profile_label(cfg_info: dict | None, fallback: str) -> str:
         return fallback
 
     try:
-        nozzle = cfg_info.get("nozzle_diameter")
-        layer = cfg_info.get("layer_height")
-        filament_id = (cfg_info.get("filament_settings_id") or "").strip(' "')
-        print_id = (cfg_info.get("print_settings_id") or "").strip(' "')
+        nozzle = cfg_info.nozzle_diameter
+        layer = cfg_info.layer_height
+        filament_id = (cfg_info.filament_settings_id or "").strip(' "')
+        print_id = (cfg_info.print_settings_id or "").strip(' "')
 
         # Prefer an HF* token (e.g., "... HF0.6") from filament_settings_id
         hf = None
-        m = re.search(r"(HF\s*\d+(?:\.\d+)?)", filament_id, re.IGNORECASE)
+        m = _HF_RE.search(filament_id)
         if m:
             hf = m.group(1).replace(" ", "")
         if hf is None and isinstance(nozzle, (int, float)):
@@ -53,12 +121,11 @@ def make_profile_label(cfg_info: dict | None, fallback: str) -> str:
         # Pick a tag from print_settings_id (first alphabetic token of length>=3 that's not a common noise word)
         tag = None
         if print_id:
-            toks = re.split(r"[^A-Za-z]+", print_id.upper())
-            toks = [t for t in toks if t and t not in ("MM", "COREONE", "PRUSA", "AT")]
-            for t in toks:
-                if t.isalpha() and len(t) >= 3:
-                    tag = t
-                    break
+            toks = _NONALPHA_RE.split(print_id.upper())
+            tag = next(
+                (t for t in toks if t and t not in ("MM", "COREONE", "PRUSA", "AT") and t.isalpha() and len(t) >= 3),
+                None,
+            )
 
         parts = [p for p in (hf, layer_s, tag) if p]
         return "_".join(parts) if parts else fallback
@@ -66,27 +133,53 @@ def make_profile_label(cfg_info: dict | None, fallback: str) -> str:
         return fallback
 
 
-def _load_config_info(path: Path) -> dict:
-    cfg = parse_config_ini(str(path))
-    return {
-        "nozzle_diameter": config_get_float(cfg, "nozzle_diameter"),
-        "filament_diameter": config_get_float(cfg, "filament_diameter"),
-        "filament_density": config_get_float(cfg, "filament_density"),
-        "filament_max_volumetric_speed": config_get_float(cfg, "filament_max_volumetric_speed"),
-        "max_print_speed": config_get_float(cfg, "max_print_speed"),
-        "layer_height": config_get_float(cfg, "layer_height"),
-        "first_layer_height": config_get_float(cfg, "first_layer_height"),
-        "max_layer_height": config_get_float(cfg, "max_layer_height"),
-        "min_layer_height": config_get_float(cfg, "min_layer_height"),
-        "max_fan_speed": config_get_float(cfg, "max_fan_speed"),
-        "print_settings_id": cfg.get("print_settings_id"),
-        "filament_settings_id": cfg.get("filament_settings_id"),
-        "printer_settings_id": cfg.get("printer_settings_id"),
-        "_raw": cfg,
-    }
+def _load_config_info(path: Path) -> ConfigInfo:
+    return ConfigInfo.from_file(path)
 
 
-def main():
+def _require_file(path: Path, kind: str):
+    """stat() a required input, raising a friendly error if it's missing.
+
+    One stat syscall replaces the exists()-probe-then-open pattern (which
+    stats twice); callers get the stat result for free.
+    """
+    try:
+        return path.stat()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"{kind} not found: {path}") from None
+
+
+# Single source of truth for option defaults, shared by the argparse table and
+# the no-flags fast path in main().
+_ARG_DEFAULTS = dict(
+    compare=None,
+    config=None,
+    compare_config=None,
+    output=None,
+    bins=DEFAULT_BINS,
+    no_legends=False,
+    per_layer_only=False,
+    top_n_slowest=DEFAULT_TOP_N_SLOWEST,
+    top_n_segments=200,
+    min_peak_segment_time=0.05,
+    layout="compact",
+    quiet=False,
+    filament_diameter=None,
+    filament_density=None,
+    csv=False,
+    json=False,
+)
+
+
+_PARSER = None
+
+
+def _build_parser():
+    # Built lazily and cached: library consumers that import this module (or
+    # call main() repeatedly in-process) construct the parser at most once.
+    global _PARSER
+    if _PARSER is not None:
+        return _PARSER
     parser = argparse.ArgumentParser(
         description="GCodeProfiler: analyze PrusaSlicer ASCII .gcode and export an Excel performance dashboard (metrics, legends, charts)."
     )
@@ -106,31 +199,27 @@ def main():
         ),
     )
     parser.add_argument("--output", help="Optional output .xlsx path (defaults to <input>.xlsx or <input>_vs_<compare>.xlsx)")
-    parser.add_argument("--bins", type=int, default=DEFAULT_BINS, help=f"Histogram bins (default: {DEFAULT_BINS})")
+    parser.add_argument("--bins", type=int, help=f"Histogram bins (default: {DEFAULT_BINS})")
     parser.add_argument("--no-legends", action="store_true", help="Skip legend-like Feature Type summary table")
     parser.add_argument("--per-layer-only", action="store_true", help="Skip per-move rows for smaller files")
     parser.add_argument(
         "--top-n-slowest",
         type=int,
-        default=DEFAULT_TOP_N_SLOWEST,
         help=f"How many slowest layers to list/chart (default: {DEFAULT_TOP_N_SLOWEST})",
     )
     parser.add_argument(
         "--top-n-segments",
         type=int,
-        default=200,
         help="How many top extrusion segments by volumetric flow to list (default: 200)",
     )
     parser.add_argument(
         "--min-peak-segment-time",
         type=float,
-        default=0.05,
         help="Ignore extrusion segments shorter than this (seconds) when computing peak flow/speed (reduces spike noise). Default: 0.05",
     )
     parser.add_argument(
         "--layout",
         choices=["compact", "wide"],
-        default="compact",
         help="Dashboard layout. compact packs charts tighter; wide uses larger charts/spacing.",
     )
     parser.add_argument("--quiet", action="store_true", help="Suppress progress output")
@@ -138,18 +227,39 @@ def main():
     parser.add_argument("--filament-density", type=float, help="Override filament density (g/cm^3)")
     parser.add_argument("--csv", action="store_true", help="Also write CSV exports next to the .xlsx")
     parser.add_argument("--json", action="store_true", help="Also write a small JSON summary next to the .xlsx")
+    parser.set_defaults(**_ARG_DEFAULTS)
+    _PARSER = parser
+    return parser
+
+
+def main():
+    # Re-anchor the status clock: module import time is misleading when main()
+    # is invoked later by a library consumer.
+    global _T0
+    _T0 = time.time()
+
+    argv = sys.argv[1:]
+    if len(argv) == 1 and not argv[0].startswith("-"):
+        # Fast path for the common `gcode_profiler file.gcode` shape: skip
+        # building the full argparse table (~10 ms of startup in batch loops).
+        args = argparse.Namespace(gcode=argv[0], **_ARG_DEFAULTS)
+    else:
+        args = _build_parser().parse_args(argv)
+
+    # Deferred heavy import (openpyxl); cached in sys.modules from here on.
+    from .excel_writer import write_xlsx, write_csv_exports, build_json_summary
 
-    args = parser.parse_args()
     status_enabled = not bool(args.quiet)
+    # Bind the progress callback once; None when quiet lets callees skip the
+    # callback branch entirely instead of calling into a no-op.
+    _status_cb = status if status_enabled else None
 
     gcode_path = Path(args.gcode)
-    if not gcode_path.exists():
-        raise FileNotFoundError(f"G-code file not found: {gcode_path}")
+    _require_file(gcode_path, "G-code file")
 
     compare_paths = [Path(p) for p in (args.compare or [])]
     for p in compare_paths:
-        if not p.exists():
-            raise FileNotFoundError(f"Compare G-code file not found: {p}")
+        _require_file(p, "Compare G-code file")
 
     if args.output:
         out_xlsx = Path(args.output)
@@ -164,18 +274,16 @@ def main():
     config_info = None
     if args.config:
         cfg_path = Path(args.config)
-        if not cfg_path.exists():
-            raise FileNotFoundError(f"Config file not found: {cfg_path}")
+        _require_file(cfg_path, "Config file")
         config_info = _load_config_info(cfg_path)
 
     a_label = make_profile_label(config_info, "A")
 
     # Compare config infos (optional)
-    compare_config_infos: list[dict | None] = []
+    compare_config_infos: list[ConfigInfo | None] = []
     compare_cfg_paths = [Path(p) for p in (args.compare_config or [])]
     for p in compare_cfg_paths:
-        if not p.exists():
-            raise FileNotFoundError(f"Compare config file not found: {p}")
+        _require_file(p, "Compare config file")
 
     if compare_cfg_paths:
         if len(compare_cfg_paths) == 1 and len(compare_paths) >= 1:
@@ -188,31 +296,53 @@ def main():
     filament_diam = (
         float(args.filament_diameter)
         if args.filament_diameter is not None
-        else float((config_info or {}).get("filament_diameter") or DEFAULT_FILAMENT_DIAMETER_MM)
+        else float((config_info.filament_diameter if config_info else None) or DEFAULT_FILAMENT_DIAMETER_MM)
     )
     filament_density = (
         float(args.filament_density)
         if args.filament_density is not None
-        else float((config_info or {}).get("filament_density") or 1.24)
+        else float((config_info.filament_density if config_info else None) or 1.24)
     )
 
-    status(f"Parsing G-code A ({gcode_path.name})", status_enabled)
-    moves, layer_z_map = parse_gcode(
-        str(gcode_path),
-        filament_diam,
-        status_cb=(lambda m: status(m, status_enabled)),
-        status_every_lines=250_000,
-    )
-
-    compare_runs = []
-    for idx, cp in enumerate(compare_paths, start=1):
-        status(f"Parsing compare G-code {idx} ({cp.name})", status_enabled)
-        cm, cz = parse_gcode(
-            str(cp),
+    # With --json we record input hashes in the run metadata. Compute gcode
+    # hashes incrementally inside parse_gcode (no extra read pass) and hash the
+    # config file(s) on a small thread pool so it overlaps workbook building.
+    want_manifest = bool(args.json)
+
+    gcode_digest = None
+    if compare_paths:
+        # parse_gcode is GIL-bound pure-Python text processing, so with
+        # multiple inputs each file goes to its own worker process and they
+        # parse in parallel. The single-file fast path stays in-process.
+        jobs = [str(gcode_path)] + [str(cp) for cp in compare_paths]
+        status(f"Parsing {len(jobs)} G-code files in parallel", status_enabled)
+        with ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as ex:
+            futures = [ex.submit(_parse_worker, p, filament_diam, want_manifest) for p in jobs]
+            names_by_future = {id(f): Path(p).name for f, p in zip(futures, jobs)}
+            for fut in as_completed(futures):
+                status(f"Parsed {names_by_future[id(fut)]}", status_enabled)
+            results = [f.result() for f in futures]
+        moves, layer_z_map, gcode_digest = results[0]
+        parsed_compares = results[1:]
+    else:
+        status(f"Parsing G-code A ({gcode_path.name})", status_enabled)
+        gcode_hasher = hashlib.sha256() if want_manifest else None
+        moves, layer_z_map = parse_gcode(
+            str(gcode_path),
             filament_diam,
-            status_cb=(lambda m: status(m, status_enabled)),
+            status_cb=_status_cb,
             status_every_lines=250_000,
+            hasher=gcode_hasher,
         )
+        if gcode_hasher is not None:
+            gcode_digest = gcode_hasher.hexdigest()
+        parsed_compares = []
+
+    compare_runs = []
+    compare_digests = []
+    for idx, cp in enumerate(compare_paths, start=1):
+        cm, cz, cd = parsed_compares[idx - 1]
+        compare_digests.append(cd)
         cfg_i = compare_config_infos[idx - 1] if (compare_config_infos and (idx - 1) < len(compare_config_infos)) else None
         compare_runs.append(
             {
@@ -220,10 +350,20 @@ def main():
                 "label": make_profile_label(cfg_i, cp.stem),
                 "moves": cm,
                 "layer_z_map": cz,
-                "config_info": cfg_i,
+                "config_info": (cfg_i.as_dict() if cfg_i else None),
             }
         )
 
+    # Kick off config hashing before the (slow) Excel write so the results are
+    # ready by the time the manifest is assembled.
+    hash_ex = None
+    config_hash_futures = {}
+    if want_manifest:
+        cfg_hash_paths = ([Path(args.config)] if args.config else []) + compare_cfg_paths
+        if cfg_hash_paths:
+            hash_ex = ThreadPoolExecutor(max_workers=min(8, len(cfg_hash_paths)))
+            config_hash_futures = {str(p): hash_ex.submit(sha256_file, str(p)) for p in cfg_hash_paths}
+
     status("Building Excel workbook", status_enabled)
 
     write_xlsx(
@@ -236,22 +376,41 @@ def main():
         top_n_slowest=int(args.top_n_slowest),
         filament_diameter_mm=filament_diam,
         filament_density_g_cm3=filament_density,
-        config_info=config_info,
+        config_info=(config_info.as_dict() if config_info else None),
         layout=str(args.layout),
         run_label=a_label,
         min_peak_segment_time_s=float(args.min_peak_segment_time),
         compare_runs=compare_runs,
         top_n_segments=int(args.top_n_segments),
-        status_cb=(lambda m: status(m, status_enabled)),
+        status_cb=_status_cb,
     )
 
-    # Optional sidecar exports
+    # Optional sidecar exports. Both start from the same per-layer
+    # aggregation, so compute it once when either is requested.
+    export_layers = None
+    if args.csv or args.json:
+        from .excel_writer import _aggregate_layers_for_export
+
+        export_layers = _aggregate_layers_for_export(
+            moves, layer_z_map, config_info=(config_info.as_dict() if config_info else None)
+        )
     if args.csv:
-        write_csv_exports(moves, layer_z_map, str(out_xlsx), config_info=config_info, top_n_segments=int(args.top_n_segments))
+        write_csv_exports(
+            moves,
+            layer_z_map,
+            str(out_xlsx),
+            config_info=(config_info.as_dict() if config_info else None),
+            top_n_segments=int(args.top_n_segments),
+            layers=export_layers,
+        )
     if args.json:
-        summary = build_json_summary(moves, layer_z_map, config_info=config_info)
-        with open(Path(str(out_xlsx)).with_suffix(".summary.json"), "w", encoding="utf-8") as f:
-            json.dump(summary, f, indent=2)
+        summary = build_json_summary(
+            moves,
+            layer_z_map,
+            config_info=(config_info.as_dict() if config_info else None),
+            layers=export_layers,
+        )
+        _dump_json(summary, Path(str(out_xlsx)).with_suffix(".summary.json"))
 
         # A lightweight run metadata file (helps compare/trace)
         meta = {
@@ -262,11 +421,23 @@ def main():
             "labels_compare": [r["label"] for r in compare_runs],
             "filament_diameter_mm": filament_diam,
             "filament_density_g_cm3": filament_density,
+            "input_sha256": {
+                str(gcode_path): gcode_digest,
+                **{str(p): d for p, d in zip(compare_paths, compare_digests)},
+            },
+            "config_sha256": {p: f.result() for p, f in config_hash_futures.items()},
         }
-        meta_bytes = json.dumps(meta, sort_keys=True).encode("utf-8")
-        meta["run_hash"] = hashlib.sha256(meta_bytes).hexdigest()
-        with open(Path(str(out_xlsx)).with_suffix(".run.json"), "w", encoding="utf-8") as f:
-            json.dump(meta, f, indent=2)
+        if hash_ex is not None:
+            hash_ex.shutdown(wait=False)
+        # Serialize once and hash the exact bytes that land on disk (stdlib
+        # json so the layout doesn't depend on which backend is installed);
+        # the digest goes to a .run.sha256 sidecar so it covers the full file.
+        payload = json.dumps(meta, sort_keys=True, indent=2).encode("utf-8")
+        run_json = Path(str(out_xlsx)).with_suffix(".run.json")
+        run_json.write_bytes(payload)
+        run_json.with_suffix(".sha256").write_text(
+            hashlib.sha256(payload).hexdigest() + "\n", encoding="utf-8"
+        )
 
     status(f"Done -> {out_xlsx}", status_enabled)
     print(f"Wrote {len(moves)} moves to {out_xlsx}")
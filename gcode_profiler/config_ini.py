@@ -1,4 +1,12 @@
-import re
+import hashlib
+import os
+import pickle
+import tempfile
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+
+_CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "gcode_profiler"
+
 
 def _ini_value_to_float(v: str):
     """Best-effort parse of numeric-ish values from config.ini.
@@ -13,18 +21,19 @@ def _ini_value_to_float(v: str):
     """
     if v is None:
         return None
-    s = str(v).strip()
-    if not s:
-        return None
-    if s.lower() in ("nil", "none"):
+    s = v if isinstance(v, str) else str(v)
+    # EAFP fast path: the vast majority of config values are plain numerics.
+    try:
+        return float(s)
+    except ValueError:
+        pass
+    s = s.strip()
+    if not s or s.lower() in ("nil", "none"):
         return None
     if (s.startswith('"') and s.endswith('"')) or (s.startswith("'") and s.endswith("'")):
         s = s[1:-1].strip()
     if s.endswith('%'):
-        try:
-            return float(s[:-1].strip())
-        except Exception:
-            return None
+        s = s[:-1].strip()
     try:
         return float(s)
     except Exception:
@@ -37,20 +46,112 @@ def parse_config_ini(path: str) -> dict:
     Lines starting with `#` are treated as comments.
     """
     out: dict[str, str] = {}
+    # Configs are small (tens of KB): slurp in one read instead of paying
+    # per-line buffer refills, then split in memory.
     with open(path, 'r', encoding='utf-8', errors='replace') as f:
-        for line in f:
-            line = line.rstrip("\n")
-            if not line or line.lstrip().startswith('#'):
-                continue
-            m = re.match(r'^([^=]+?)\s*=\s*(.*)$', line)
-            if not m:
-                continue
-            k = m.group(1).strip()
-            v = m.group(2).strip()
-            out[k] = v
+        data = f.read()
+    for line in data.splitlines():
+        if not line or line.lstrip().startswith('#'):
+            continue
+        # Plain `key = value` lines: str.partition beats a regex here.
+        k, sep, v = line.partition('=')
+        if not sep:
+            continue
+        k = k.strip()
+        if not k:
+            continue
+        out[k] = v.strip()
+    return out
+
+
+def parse_config_ini_cached(path: str) -> dict:
+    """`parse_config_ini` with a small on-disk cache under ~/.cache/gcode_profiler.
+
+    Entries are keyed by the file's (mtime_ns, size), so warm runs skip the
+    line loop entirely while any edit to the config invalidates the entry.
+    Cache problems (unwritable dir, corrupt pickle, ...) fall back to a fresh
+    parse; the cache is strictly an optimization.
+    """
+    cache_file = None
+    key = None
+    try:
+        st = os.stat(path)
+        key = (st.st_mtime_ns, st.st_size)
+        name = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+        cache_file = _CACHE_DIR / f"{name}.pkl"
+        if cache_file.exists():
+            with open(cache_file, "rb") as f:
+                stored_key, out = pickle.load(f)
+            if stored_key == key:
+                return out
+    except Exception:
+        pass
+
+    out = parse_config_ini(path)
+
+    if cache_file is not None:
+        try:
+            _CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=str(_CACHE_DIR), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump((key, out), f)
+            os.replace(tmp, cache_file)  # atomic publish
+        except Exception:
+            pass
     return out
 
 
 def config_get_float(cfg: dict, key: str):
     return _ini_value_to_float(cfg.get(key))
 
+
+@dataclass(frozen=True, slots=True)
+class ConfigInfo:
+    """Typed, immutable view of the config.ini fields the profiler uses.
+
+    Attribute access replaces repeated string-keyed dict lookups in the CLI;
+    `as_dict()` bridges to the dict-based `write_xlsx` signature.
+    """
+
+    nozzle_diameter: float | None = None
+    filament_diameter: float | None = None
+    filament_density: float | None = None
+    filament_max_volumetric_speed: float | None = None
+    max_print_speed: float | None = None
+    layer_height: float | None = None
+    first_layer_height: float | None = None
+    max_layer_height: float | None = None
+    min_layer_height: float | None = None
+    max_fan_speed: float | None = None
+    print_settings_id: str | None = None
+    filament_settings_id: str | None = None
+    printer_settings_id: str | None = None
+    raw: dict = field(default_factory=dict)
+
+    _FLOAT_KEYS = (
+        "nozzle_diameter",
+        "filament_diameter",
+        "filament_density",
+        "filament_max_volumetric_speed",
+        "max_print_speed",
+        "layer_height",
+        "first_layer_height",
+        "max_layer_height",
+        "min_layer_height",
+        "max_fan_speed",
+    )
+    _STR_KEYS = ("print_settings_id", "filament_settings_id", "printer_settings_id")
+
+    @classmethod
+    def from_file(cls, path) -> "ConfigInfo":
+        cfg = parse_config_ini_cached(str(path))
+        kwargs = {k: config_get_float(cfg, k) for k in cls._FLOAT_KEYS}
+        kwargs.update({k: cfg.get(k) for k in cls._STR_KEYS})
+        return cls(raw=cfg, **kwargs)
+
+    def as_dict(self) -> dict:
+        """Dict view matching write_xlsx's `config_info` mapping."""
+        d = {f.name: getattr(self, f.name) for f in fields(self) if f.name != "raw"}
+        d["_raw"] = self.raw
+        return d
+
@@ -1,15 +1,17 @@
+import bisect
+import heapq
 import math
-import re
-from collections import Counter, defaultdict
+from collections import defaultdict
+from operator import itemgetter
 from pathlib import Path
 
 from openpyxl import Workbook
-from openpyxl.chart import BarChart, LineChart, PieChart, Reference, ScatterChart, Series
+from openpyxl.chart import BarChart, PieChart, Reference, ScatterChart, Series
 from openpyxl.chart.series_factory import SeriesFactory
 from openpyxl.chart.label import DataLabelList
 from openpyxl.formatting.rule import CellIsRule
 from openpyxl.styles import Alignment, PatternFill
-from openpyxl.utils import get_column_letter
+from openpyxl.utils import column_index_from_string, get_column_letter
 # RichText support differs across openpyxl versions.
 # Some versions (e.g. in certain CI environments) do not expose RichText.
 try:
@@ -21,7 +23,7 @@ except Exception:  # pragma: no cover
     CharacterProperties = None
 
 
-from .stats import weighted_quantile, make_bins, bin_counts
+from .stats import weighted_quantile, weighted_quantiles, make_bins, bin_counts
 from .gcode_parser import filament_area_mm2
 from .config_ini import _ini_value_to_float
 
@@ -57,6 +59,42 @@ def write_xlsx(
 
     # Geometry for filament usage calculations
     area_mm2 = filament_area_mm2(float(filament_diameter_mm))
+    # grams of filament per mm extruded: area (mm²) x density (g/cm³) / 1000
+    g_per_mm = area_mm2 * float(filament_density_g_cm3) / 1000.0
+
+    # The parser always emits these as floats; normalize once so the hot
+    # loops below can index directly instead of `.get(...) or 0.0` per cell.
+    # speed_mm_s is deliberately left alone — None there means "no feedrate
+    # seen yet" and is filtered, not zeroed.
+    for m in moves:
+        for k in ("time_s", "dist_mm", "de_mm", "flow_mm3_s"):
+            if m.get(k) is None:
+                m[k] = 0.0
+
+    # Config-derived constants, resolved once up front: the
+    # `(config_info or {}).get(...)` pattern otherwise rebuilds a throwaway
+    # dict per lookup, and the float() try/excepts were repeated per section.
+    cfg = config_info or {}
+    cfg_max_speed = cfg.get("max_print_speed")
+    cfg_max_flow = cfg.get("filament_max_volumetric_speed")
+    cfg_max_lh = cfg.get("max_layer_height")
+    cfg_min_lh = cfg.get("min_layer_height")
+    try:
+        flow_limit_f = float(cfg_max_flow)
+    except (TypeError, ValueError):
+        flow_limit_f = None
+    try:
+        speed_limit_f = float(cfg_max_speed)
+    except (TypeError, ValueError):
+        speed_limit_f = None
+    try:
+        max_lh_f = float(cfg_max_lh)
+    except (TypeError, ValueError):
+        max_lh_f = None
+    try:
+        min_lh_f = float(cfg_min_lh)
+    except (TypeError, ValueError):
+        min_lh_f = None
 
     # Dashboard (first sheet)
     ws_dash = wb.active
@@ -91,12 +129,19 @@ def write_xlsx(
 
     ws_moves.append(headers)
 
-    if not per_layer_only:
-        for m in moves:
-            ws_moves.append([m.get(h) for h in headers])
+    # Style the type column while streaming rows in: one shared Alignment
+    # object, no second whole-column pass (ws_moves["C"] would materialize and
+    # re-touch every cell of the largest sheet in the workbook).
+    wrap_top = Alignment(wrap_text=True, vertical="top")
+    ws_moves.cell(row=1, column=3).alignment = wrap_top
 
-    for cell in ws_moves["C"]:
-        cell.alignment = Alignment(wrap_text=True, vertical="top")
+    if not per_layer_only:
+        # itemgetter extracts all 19 columns in one C call per move; the
+        # parser always emits every key, so no .get() fallback is needed.
+        row_of = itemgetter(*headers)
+        for r, m in enumerate(moves, start=2):
+            ws_moves.append(row_of(m))
+            ws_moves.cell(row=r, column=3).alignment = wrap_top
     set_basic_column_widths(
         ws_moves,
         {
@@ -150,12 +195,39 @@ def write_xlsx(
         ]
     )
 
-    by_layer = defaultdict(list)
-    for m in moves:
-        by_layer[m["layer"]].append(m)
+    # The parser emits moves in layer order, so each layer is a consecutive
+    # run: group by slicing run boundaries instead of appending every move
+    # into a defaultdict list (~one allocation per move). If a layer index
+    # ever reappears out of order, fall back to the dict grouping.
+    by_layer = {}
+    runs_ok = True
+    cur_layer = None
+    run_start = 0
+    for i, m in enumerate(moves):
+        L = m["layer"]
+        if L != cur_layer:
+            if cur_layer is not None:
+                if cur_layer in by_layer:
+                    runs_ok = False
+                    break
+                by_layer[cur_layer] = moves[run_start:i]
+            cur_layer = L
+            run_start = i
+    if runs_ok and cur_layer is not None:
+        runs_ok = cur_layer not in by_layer
+        if runs_ok:
+            by_layer[cur_layer] = moves[run_start:]
+    if not runs_ok:
+        by_layer = defaultdict(list)
+        for m in moves:
+            by_layer[m["layer"]].append(m)
 
     layers_sorted = sorted(by_layer.keys())
     prev_z = None
+    # In-memory copy of the Layers rows; later consumers (legend layer
+    # heights, Top_Slowest_Layers) read this instead of re-walking the
+    # sheet's cell graph with iter_rows.
+    layer_rows = []
 
     # Track last known setpoints per layer for cleaner charts
     last_hotend = None
@@ -169,90 +241,94 @@ def write_xlsx(
         if z_val is not None:
             prev_z = z_val
 
-        t = sum(m["time_s"] for m in ms)
-        d = sum(m["dist_mm"] for m in ms)
-        e = sum(m["de_mm"] for m in ms)
+        # Single pass over the layer's moves: every accumulator at once,
+        # instead of ~10 separate comprehension/sum passes per layer.
+        t = d = e = 0.0
+        flow_time = 0.0
+        travel_time = travel_dist = 0.0
+        extrude_time = 0.0
+        retract_count = 0
+        retract_mm = 0.0
+        short_fast = 0
+        fan_time = fan_w_total = 0.0
+        over_flow_t = over_speed_t = 0.0
+        sp_vals = []
+        sp_w = []
+        fl_vals = []
+        fl_w = []
 
-        # Per-layer worst-case / percentile metrics (tuning-oriented)
-        sp_vals = [m["speed_mm_s"] for m in ms if m.get("speed_mm_s") is not None and (m.get("dist_mm") or 0) > 0]
-        sp_w = [m["time_s"] for m in ms if m.get("speed_mm_s") is not None and (m.get("dist_mm") or 0) > 0]
-        fl_vals = [m["flow_mm3_s"] for m in ms if m.get("flow_mm3_s") is not None and (m.get("flow_mm3_s") or 0) > 0]
-        fl_w = [m["time_s"] for m in ms if m.get("flow_mm3_s") is not None and (m.get("flow_mm3_s") or 0) > 0]
+        for m in ms:
+            mt = m["time_s"]
+            md = m["dist_mm"]
+            mde = m["de_mm"]
+            msp = m["speed_mm_s"]
+            mfl = m["flow_mm3_s"]
+
+            t += mt
+            d += md
+            e += mde
+            flow_time += mfl * mt
+
+            if msp is not None and md > 0:
+                sp_vals.append(msp)
+                sp_w.append(mt)
+                if speed_limit_f is not None and msp > speed_limit_f:
+                    over_speed_t += mt
+            if mfl > 0:
+                fl_vals.append(mfl)
+                fl_w.append(mt)
+                if flow_limit_f is not None and mfl > flow_limit_f:
+                    over_flow_t += mt
+
+            if mde == 0.0:
+                if md > 0.0:
+                    travel_time += mt
+                    travel_dist += md
+            elif mde > 0.0:
+                if mt > 0.0:
+                    extrude_time += mt
+                if 0.0 < md < 0.6 and (msp or 0.0) > 50.0:
+                    short_fast += 1
+            else:
+                retract_count += 1
+                retract_mm -= mde
+
+            fan = m["fan_pct"]
+            if fan is not None:
+                fan_time += fan * mt
+                fan_w_total += mt
+            if m["hotend_C"] is not None:
+                last_hotend = m["hotend_C"]
+            if m["bed_C"] is not None:
+                last_bed = m["bed_C"]
+            if m["chamber_C"] is not None:
+                last_chamber = m["chamber_C"]
 
+        # Per-layer worst-case / percentile metrics (tuning-oriented)
         peak_speed = max(sp_vals) if sp_vals else None
-        p95_speed = weighted_quantile(sp_vals, sp_w, 0.95) if sp_vals else None
-        p99_speed = weighted_quantile(sp_vals, sp_w, 0.99) if sp_vals else None
+        p95_speed, p99_speed = weighted_quantiles(sp_vals, sp_w, (0.95, 0.99))
         peak_flow = max(fl_vals) if fl_vals else None
-        p95_flow = weighted_quantile(fl_vals, fl_w, 0.95) if fl_vals else None
-        p99_flow = weighted_quantile(fl_vals, fl_w, 0.99) if fl_vals else None
-
-        # Travel / extrusion / retraction diagnostics
-        travel_time = sum(m["time_s"] for m in ms if (m.get("de_mm") or 0.0) == 0.0 and (m.get("dist_mm") or 0.0) > 0.0)
-        travel_dist = sum(m["dist_mm"] for m in ms if (m.get("de_mm") or 0.0) == 0.0 and (m.get("dist_mm") or 0.0) > 0.0)
-        extrude_time = sum(m["time_s"] for m in ms if (m.get("de_mm") or 0.0) > 0.0 and (m.get("time_s") or 0.0) > 0.0)
-        retract_moves = [m for m in ms if (m.get("de_mm") or 0.0) < 0.0]
-        retract_count = len(retract_moves)
-        retract_mm = -sum(m.get("de_mm") or 0.0 for m in retract_moves)
-
-        # Simple dynamics proxy: count short, fast extrusion segments (ringing / PA sensitivity proxy)
-        short_fast = 0
-        for m in ms:
-            if (m.get("de_mm") or 0.0) > 0.0 and (m.get("dist_mm") or 0.0) > 0.0:
-                if (m.get("dist_mm") or 0.0) < 0.6 and (m.get("speed_mm_s") or 0.0) > 50.0:
-                    short_fast += 1
+        p95_flow, p99_flow = weighted_quantiles(fl_vals, fl_w, (0.95, 0.99))
+
         dynamics_score = short_fast
 
-        flow_limit = (config_info or {}).get("filament_max_volumetric_speed")
-        speed_limit = (config_info or {}).get("max_print_speed")
-        flow_headroom = None
-        speed_headroom = None
-        try:
-            if flow_limit is not None and p99_flow is not None:
-                flow_headroom = float(flow_limit) - float(p99_flow)
-        except Exception:
-            pass
-        try:
-            if speed_limit is not None and p99_speed is not None:
-                speed_headroom = float(speed_limit) - float(p99_speed)
-        except Exception:
-            pass
-        over_flow_pct = None
-        over_speed_pct = None
-        if t and t > 0:
-            if flow_limit is not None:
-                try:
-                    fl_lim = float(flow_limit)
-                    over_t = sum(m["time_s"] for m in ms if (m.get("flow_mm3_s") or 0) > fl_lim)
-                    over_flow_pct = over_t / t
-                except Exception:
-                    pass
-            if speed_limit is not None:
-                try:
-                    sp_lim = float(speed_limit)
-                    over_t = sum(m["time_s"] for m in ms if (m.get("speed_mm_s") or 0) > sp_lim)
-                    over_speed_pct = over_t / t
-                except Exception:
-                    pass
+        flow_headroom = (flow_limit_f - p99_flow) if (flow_limit_f is not None and p99_flow is not None) else None
+        speed_headroom = (speed_limit_f - p99_speed) if (speed_limit_f is not None and p99_speed is not None) else None
 
         if t > 0:
+            over_flow_pct = (over_flow_t / t) if flow_limit_f is not None else None
+            over_speed_pct = (over_speed_t / t) if speed_limit_f is not None else None
             avg_speed = d / t
-            avg_flow = sum(m["flow_mm3_s"] * m["time_s"] for m in ms) / t
-            fan_pairs = [(m["fan_pct"], m["time_s"]) for m in ms if m["fan_pct"] is not None]
-            avg_fan = (sum(v * w for v, w in fan_pairs) / sum(w for _, w in fan_pairs)) if fan_pairs else None
+            avg_flow = flow_time / t
+            avg_fan = (fan_time / fan_w_total) if fan_w_total > 0 else None
         else:
+            over_flow_pct = None
+            over_speed_pct = None
             avg_speed = None
             avg_flow = None
             avg_fan = None
 
-        for m in ms:
-            if m["hotend_C"] is not None:
-                last_hotend = m["hotend_C"]
-            if m["bed_C"] is not None:
-                last_bed = m["bed_C"]
-            if m["chamber_C"] is not None:
-                last_chamber = m["chamber_C"]
-
-        ws_layers.append([
+        row = [
             L,
             z_val,
             layer_h,
@@ -281,32 +357,30 @@ def write_xlsx(
             last_hotend,
             last_bed,
             last_chamber,
-        ])
+        ]
+        layer_rows.append(row)
+        ws_layers.append(row)
 
     # Optional reference columns from config.ini (used for nicer chart scaling / reference lines)
     if config_info:
-        ref_flow = config_info.get('filament_max_volumetric_speed')
-        ref_speed = config_info.get('max_print_speed')
-        ref_lh_max = config_info.get('max_layer_height')
-
         # Add columns only if at least one reference value exists
-        if any(v is not None for v in (ref_flow, ref_speed, ref_lh_max)):
+        if any(v is not None for v in (cfg_max_flow, cfg_max_speed, cfg_max_lh)):
             base_cols = ws_layers.max_column
             # Headers
-            if ref_flow is not None:
+            if cfg_max_flow is not None:
                 ws_layers.cell(row=1, column=base_cols + 1, value='ref_flow_max_mm3_s')
                 for r in range(2, ws_layers.max_row + 1):
-                    ws_layers.cell(row=r, column=base_cols + 1, value=float(ref_flow))
+                    ws_layers.cell(row=r, column=base_cols + 1, value=float(cfg_max_flow))
                 base_cols += 1
-            if ref_speed is not None:
+            if cfg_max_speed is not None:
                 ws_layers.cell(row=1, column=base_cols + 1, value='ref_speed_max_mm_s')
                 for r in range(2, ws_layers.max_row + 1):
-                    ws_layers.cell(row=r, column=base_cols + 1, value=float(ref_speed))
+                    ws_layers.cell(row=r, column=base_cols + 1, value=float(cfg_max_speed))
                 base_cols += 1
-            if ref_lh_max is not None:
+            if cfg_max_lh is not None:
                 ws_layers.cell(row=1, column=base_cols + 1, value='ref_layerheight_max_mm')
                 for r in range(2, ws_layers.max_row + 1):
-                    ws_layers.cell(row=r, column=base_cols + 1, value=float(ref_lh_max))
+                    ws_layers.cell(row=r, column=base_cols + 1, value=float(cfg_max_lh))
                 base_cols += 1
 
     set_basic_column_widths(
@@ -349,60 +423,40 @@ def write_xlsx(
         red_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
         yellow_fill = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")
 
-        max_flow = config_info.get('filament_max_volumetric_speed')
-        max_speed = config_info.get('max_print_speed')
-        max_lh = config_info.get('max_layer_height')
-        min_lh = config_info.get('min_layer_height')
-
         last = ws_layers.max_row
-        # Avg speed (col G)
-        if max_speed is not None:
+        # Avg speed (col G), peak/P95/P99 speed (contiguous I:K) — one rule
+        # per range, with the formula string built once.
+        if speed_limit_f is not None:
+            sp_formula = [str(speed_limit_f)]
             ws_layers.conditional_formatting.add(
                 f"G2:G{last}",
-                CellIsRule(operator='greaterThan', formula=[str(float(max_speed))], fill=yellow_fill)
+                CellIsRule(operator='greaterThan', formula=sp_formula, fill=yellow_fill)
             )
-            # Peak/P95/P99 speed
             ws_layers.conditional_formatting.add(
-                f"I2:I{last}",
-                CellIsRule(operator='greaterThan', formula=[str(float(max_speed))], fill=yellow_fill)
+                f"I2:K{last}",
+                CellIsRule(operator='greaterThan', formula=sp_formula, fill=yellow_fill)
             )
-            ws_layers.conditional_formatting.add(
-                f"J2:J{last}",
-                CellIsRule(operator='greaterThan', formula=[str(float(max_speed))], fill=yellow_fill)
-            )
-            ws_layers.conditional_formatting.add(
-                f"K2:K{last}",
-                CellIsRule(operator='greaterThan', formula=[str(float(max_speed))], fill=yellow_fill)
-            )
-        # Avg flow (col H)
-        if max_flow is not None:
+        # Avg flow (col H), peak/P95/P99 flow (contiguous L:N)
+        if flow_limit_f is not None:
+            fl_formula = [str(flow_limit_f)]
             ws_layers.conditional_formatting.add(
                 f"H2:H{last}",
-                CellIsRule(operator='greaterThan', formula=[str(float(max_flow))], fill=red_fill)
-            )
-            # Peak/P95/P99 flow
-            ws_layers.conditional_formatting.add(
-                f"L2:L{last}",
-                CellIsRule(operator='greaterThan', formula=[str(float(max_flow))], fill=red_fill)
-            )
-            ws_layers.conditional_formatting.add(
-                f"M2:M{last}",
-                CellIsRule(operator='greaterThan', formula=[str(float(max_flow))], fill=red_fill)
+                CellIsRule(operator='greaterThan', formula=fl_formula, fill=red_fill)
             )
             ws_layers.conditional_formatting.add(
-                f"N2:N{last}",
-                CellIsRule(operator='greaterThan', formula=[str(float(max_flow))], fill=red_fill)
+                f"L2:N{last}",
+                CellIsRule(operator='greaterThan', formula=fl_formula, fill=red_fill)
             )
         # Layer height bounds (col C)
-        if max_lh is not None:
+        if max_lh_f is not None:
             ws_layers.conditional_formatting.add(
                 f"C2:C{last}",
-                CellIsRule(operator='greaterThan', formula=[str(float(max_lh))], fill=yellow_fill)
+                CellIsRule(operator='greaterThan', formula=[str(max_lh_f)], fill=yellow_fill)
             )
-        if min_lh is not None:
+        if min_lh_f is not None:
             ws_layers.conditional_formatting.add(
                 f"C2:C{last}",
-                CellIsRule(operator='lessThan', formula=[str(float(min_lh))], fill=yellow_fill)
+                CellIsRule(operator='lessThan', formula=[str(min_lh_f)], fill=yellow_fill)
             )
 
     # Legends
@@ -438,48 +492,71 @@ def write_xlsx(
 
     _status("Building legend sheets")
     if include_legends:
-        speeds = [m["speed_mm_s"] for m in moves if m["speed_mm_s"] is not None and m["dist_mm"] > 0]
-        flows = [m["flow_mm3_s"] for m in moves if m["flow_mm3_s"] is not None and m["flow_mm3_s"] > 0]
-        fans = [m["fan_pct"] for m in moves if m["fan_pct"] is not None]
-        hotends = [m["hotend_C"] for m in moves if m["hotend_C"] is not None]
-        beds = [m["bed_C"] for m in moves if m["bed_C"] is not None]
-
-        layer_heights = []
-        for row in ws_layers.iter_rows(min_row=2, values_only=True):
-            lh = row[2]
-            if lh is not None and lh > 0:
-                layer_heights.append(lh)
-
-        add_legend_sheet("Legend_Speed", speeds, "mm/s", forced_min=0, forced_max=(config_info or {}).get("max_print_speed"))
-        add_legend_sheet("Legend_Flow_mm3s", flows, "mm³/s", forced_min=0, forced_max=(config_info or {}).get("filament_max_volumetric_speed"))
+        # One pass over moves feeds every legend / feature-type sheet: the
+        # legend value lists, the time and extrusion totals, and a type->moves
+        # grouping that replaces refiltering the full move list per type.
+        speeds = []
+        flows = []
+        fans = []
+        hotends = []
+        beds = []
+        total_time_s = 0.0
+        total_de_mm = 0.0
+        by_type_moves = defaultdict(list)
+        for m in moves:
+            sp = m["speed_mm_s"]
+            if sp is not None and m["dist_mm"] > 0:
+                speeds.append(sp)
+            fl = m["flow_mm3_s"]
+            if fl is not None and fl > 0:
+                flows.append(fl)
+            if m["fan_pct"] is not None:
+                fans.append(m["fan_pct"])
+            if m["hotend_C"] is not None:
+                hotends.append(m["hotend_C"])
+            if m["bed_C"] is not None:
+                beds.append(m["bed_C"])
+            total_time_s += m["time_s"]
+            de = m["de_mm"]
+            if de > 0:
+                total_de_mm += de
+            t = m.get("type")
+            if t:
+                by_type_moves[t].append(m)
+
+        # Types ordered by move count, as Counter.most_common would give
+        # them; the grouped lists already carry the counts.
+        types_by_count = sorted(by_type_moves, key=lambda t: len(by_type_moves[t]), reverse=True)
+
+        layer_heights = [r[2] for r in layer_rows if r[2] is not None and r[2] > 0]
+
+        add_legend_sheet("Legend_Speed", speeds, "mm/s", forced_min=0, forced_max=cfg_max_speed)
+        add_legend_sheet("Legend_Flow_mm3s", flows, "mm³/s", forced_min=0, forced_max=cfg_max_flow)
         add_legend_sheet("Legend_Fan_pct", fans, "%")
         add_legend_sheet("Legend_Temp_C", hotends, "°C")
         add_legend_sheet("Legend_Bed_C", beds, "°C")
-        add_legend_sheet("Legend_LayerHeight_mm", layer_heights, "mm", forced_min=(config_info or {}).get("min_layer_height"), forced_max=(config_info or {}).get("max_layer_height"))
+        add_legend_sheet("Legend_LayerHeight_mm", layer_heights, "mm", forced_min=cfg_min_lh, forced_max=cfg_max_lh)
         ws_ft = wb.create_sheet("Legend_FeatureType")
-        c = Counter(m["type"] for m in moves if m.get("type"))
-
-        # Totals for percentages + filament usage
-        total_time_s = sum(m.get("time_s", 0.0) or 0.0 for m in moves)
-        total_de_mm = sum(m.get("de_mm", 0.0) or 0.0 for m in moves if (m.get("de_mm", 0.0) or 0.0) > 0)
 
         # Excel stores time as days. We'll store time as days and format as [h]:mm:ss
         ws_ft.append(["Feature type", "Time", "Percentage", "Used filament (m)", "Used filament (g)", "Move count"])
+        ws_ft.cell(row=1, column=1).alignment = wrap_top
+
+        # Number formats per column, applied while rows are appended rather
+        # than in post-write sweeps over whole columns.
+        ft_formats = ((2, "[h]:mm:ss"), (3, "0.0%"), (4, "0.00"), (5, "0.00"))
 
-        for t, n in c.most_common():
-            ms = [m for m in moves if m.get("type") == t]
-            time_s = sum(m.get("time_s", 0.0) or 0.0 for m in ms)
-            de_mm = sum((m.get("de_mm", 0.0) or 0.0) for m in ms if (m.get("de_mm", 0.0) or 0.0) > 0)
+        for t in types_by_count:
+            ms = by_type_moves[t]
+            n = len(ms)
+            time_s = sum(m["time_s"] for m in ms)
+            de_mm = sum(m["de_mm"] for m in ms if m["de_mm"] > 0)
 
             # Percentage of total time
             pct = (time_s / total_time_s) if total_time_s > 0 else 0.0
 
             used_m = de_mm / 1000.0
-
-            # grams = volume_cm3 * density_g_cm3
-            vol_mm3 = de_mm * area_mm2
-            vol_cm3 = vol_mm3 / 1000.0
-            used_g = vol_cm3 * float(filament_density_g_cm3)
+            used_g = de_mm * g_per_mm
 
             ws_ft.append([
                 t,
@@ -489,18 +566,10 @@ def write_xlsx(
                 used_g,
                 n,
             ])
-
-        # Formatting
-        for cell in ws_ft["A"]:
-            cell.alignment = Alignment(wrap_text=True, vertical="top")
-        for cell in ws_ft["B"][1:]:
-            cell.number_format = "[h]:mm:ss"
-        for cell in ws_ft["C"][1:]:
-            cell.number_format = "0.0%"
-        for cell in ws_ft["D"][1:]:
-            cell.number_format = "0.00"
-        for cell in ws_ft["E"][1:]:
-            cell.number_format = "0.00"
+            r = ws_ft.max_row
+            ws_ft.cell(row=r, column=1).alignment = wrap_top
+            for col, fmt in ft_formats:
+                ws_ft.cell(row=r, column=col).number_format = fmt
 
         set_basic_column_widths(ws_ft, {"A": 34, "B": 12, "C": 12, "D": 16, "E": 16, "F": 12})
 
@@ -520,33 +589,52 @@ def write_xlsx(
             "Over speed limit % time",
             "Move count",
         ])
+        ws_ff.cell(row=1, column=1).alignment = wrap_top
+        ff_formats = (
+            (2, "[h]:mm:ss"),
+            (3, "0.0%"),
+            (4, "0.00"), (5, "0.00"), (6, "0.00"),
+            (7, "0.00"), (8, "0.00"), (9, "0.00"),
+            (10, "0.0%"), (11, "0.0%"),
+        )
 
-        flow_limit = (config_info or {}).get("filament_max_volumetric_speed")
-        speed_limit = (config_info or {}).get("max_print_speed")
-        try:
-            flow_limit_f = float(flow_limit) if flow_limit is not None else None
-        except Exception:
-            flow_limit_f = None
-        try:
-            speed_limit_f = float(speed_limit) if speed_limit is not None else None
-        except Exception:
-            speed_limit_f = None
+        for t in types_by_count:
+            ms = by_type_moves[t]
+            n = len(ms)
+            # Single pass per type: totals, percentile inputs, and the
+            # over-limit time accumulate together instead of eight scans.
+            time_s = 0.0
+            de_mm = 0.0
+            over_flow_t = over_speed_t = 0.0
+            sp_vals = []
+            sp_w = []
+            fl_vals = []
+            fl_w = []
+            for m in ms:
+                mt = m["time_s"]
+                time_s += mt
+                de = m["de_mm"]
+                if de > 0:
+                    de_mm += de
+                msp = m.get("speed_mm_s")
+                if msp is not None:
+                    if m["dist_mm"] > 0:
+                        sp_vals.append(msp)
+                        sp_w.append(mt)
+                    if speed_limit_f is not None and msp > speed_limit_f:
+                        over_speed_t += mt
+                mfl = m["flow_mm3_s"]
+                if mfl > 0:
+                    fl_vals.append(mfl)
+                    fl_w.append(mt)
+                    if flow_limit_f is not None and mfl > flow_limit_f:
+                        over_flow_t += mt
 
-        for t, n in c.most_common():
-            ms = [m for m in moves if m.get("type") == t]
-            time_s = sum(m.get("time_s", 0.0) or 0.0 for m in ms)
-            de_mm = sum((m.get("de_mm", 0.0) or 0.0) for m in ms if (m.get("de_mm", 0.0) or 0.0) > 0)
             pct = (time_s / total_time_s) if total_time_s > 0 else 0.0
             used_m = de_mm / 1000.0
-            vol_cm3 = (de_mm * area_mm2) / 1000.0
-            used_g = vol_cm3 * float(filament_density_g_cm3)
-
-            sp_vals = [m["speed_mm_s"] for m in ms if m.get("speed_mm_s") is not None and (m.get("dist_mm") or 0) > 0]
-            sp_w = [m["time_s"] for m in ms if m.get("speed_mm_s") is not None and (m.get("dist_mm") or 0) > 0]
-            fl_vals = [m["flow_mm3_s"] for m in ms if m.get("flow_mm3_s") is not None and (m.get("flow_mm3_s") or 0) > 0]
-            fl_w = [m["time_s"] for m in ms if m.get("flow_mm3_s") is not None and (m.get("flow_mm3_s") or 0) > 0]
-            p95_speed = weighted_quantile(sp_vals, sp_w, 0.95) if sp_vals else None
-            p99_speed = weighted_quantile(sp_vals, sp_w, 0.99) if sp_vals else None
+            used_g = de_mm * g_per_mm
+
+            p95_speed, p99_speed = weighted_quantiles(sp_vals, sp_w, (0.95, 0.99))
             peak_speed_raw = max(sp_vals) if sp_vals else None
             # Spike suppression: cap extreme peaks to a high percentile when they look like single-segment noise.
             if peak_speed_raw is not None and p99_speed is not None and peak_speed_raw > 1.5 * p99_speed:
@@ -554,8 +642,7 @@ def write_xlsx(
             else:
                 peak_speed = peak_speed_raw
 
-            p95_flow = weighted_quantile(fl_vals, fl_w, 0.95) if fl_vals else None
-            p99_flow = weighted_quantile(fl_vals, fl_w, 0.99) if fl_vals else None
+            p95_flow, p99_flow = weighted_quantiles(fl_vals, fl_w, (0.95, 0.99))
             peak_flow_raw = max(fl_vals) if fl_vals else None
             if peak_flow_raw is not None and p99_flow is not None and peak_flow_raw > 1.5 * p99_flow:
                 peak_flow = p99_flow
@@ -564,13 +651,11 @@ def write_xlsx(
 
             over_flow_pct = None
             over_speed_pct = None
-            if time_s and time_s > 0:
+            if time_s > 0:
                 if flow_limit_f is not None:
-                    over_t = sum(m.get("time_s", 0.0) or 0.0 for m in ms if (m.get("flow_mm3_s") or 0) > flow_limit_f)
-                    over_flow_pct = over_t / time_s
+                    over_flow_pct = over_flow_t / time_s
                 if speed_limit_f is not None:
-                    over_t = sum(m.get("time_s", 0.0) or 0.0 for m in ms if (m.get("speed_mm_s") or 0) > speed_limit_f)
-                    over_speed_pct = over_t / time_s
+                    over_speed_pct = over_speed_t / time_s
 
             ws_ff.append([
                 t,
@@ -586,20 +671,10 @@ def write_xlsx(
                 over_speed_pct,
                 n,
             ])
-
-        for cell in ws_ff["A"]:
-            cell.alignment = Alignment(wrap_text=True, vertical="top")
-        for cell in ws_ff["B"][1:]:
-            cell.number_format = "[h]:mm:ss"
-        for col in ("C", "J", "K"):
-            for cell in ws_ff[col][1:]:
-                cell.number_format = "0.0%"
-        for col in ("D", "E"):
-            for cell in ws_ff[col][1:]:
-                cell.number_format = "0.00"
-        for col in ("F", "G", "H", "I"):
-            for cell in ws_ff[col][1:]:
-                cell.number_format = "0.00"
+            r = ws_ff.max_row
+            ws_ff.cell(row=r, column=1).alignment = wrap_top
+            for col, fmt in ff_formats:
+                ws_ff.cell(row=r, column=col).number_format = fmt
 
         set_basic_column_widths(ws_ff, {"A": 34, "B": 12, "C": 10, "D": 16, "E": 16, "F": 16, "G": 16, "H": 16, "I": 16, "J": 18, "K": 18, "L": 12})
 
@@ -610,9 +685,11 @@ def write_xlsx(
         "rank", "layer", "type", "z_mm", "x0", "y0", "x1", "y1",
         "dist_mm", "de_mm", "time_s", "speed_mm_s", "flow_mm3_s"
     ])
-    extrude_segs = [m for m in moves if (m.get("de_mm") or 0.0) > 0.0 and (m.get("time_s") or 0.0) > 0.0 and (m.get("flow_mm3_s") or 0.0) > 0.0]
-    extrude_segs.sort(key=lambda m: (m.get("flow_mm3_s") or 0.0), reverse=True)
-    for idx, m in enumerate(extrude_segs[:max(1, int(top_n_segments))], start=1):
+    extrude_segs = [m for m in moves if m["de_mm"] > 0.0 and m["time_s"] > 0.0 and m["flow_mm3_s"] > 0.0]
+    # Top-k selection instead of sorting every extrusion segment: only the
+    # top_n_segments survivors ever get ordered.
+    top_segs = heapq.nlargest(max(1, int(top_n_segments)), extrude_segs, key=itemgetter("flow_mm3_s"))
+    for idx, m in enumerate(top_segs, start=1):
         ws_top.append([
             idx,
             m.get("layer"),
@@ -628,29 +705,40 @@ def write_xlsx(
     _status("Computing feature-type flow histograms")
     ws_fh = wb.create_sheet("FeatureFlow_Hist")
     ws_fh.append(["Feature type", "bin_lo", "bin_hi", "time_s", "time_pct"])
-    flow_values = [m.get("flow_mm3_s") for m in extrude_segs]
+    flow_values = [m["flow_mm3_s"] for m in extrude_segs]
     if flow_values:
         lo = 0.0
         hi = max(flow_values)
-        if (config_info or {}).get("filament_max_volumetric_speed") is not None:
-            try:
-                hi = max(hi, float((config_info or {}).get("filament_max_volumetric_speed")))
-            except Exception:
-                pass
+        if flow_limit_f is not None:
+            hi = max(hi, flow_limit_f)
         bins_spec = make_bins(lo, hi, bins)
-        total_time = sum(m.get("time_s") or 0.0 for m in extrude_segs)
+        total_time = 0.0
         by_type = defaultdict(list)
+        type_time = defaultdict(float)
         for m in extrude_segs:
-            by_type[m.get("type") or "UNKNOWN"].append(m)
-        for t, ms in sorted(by_type.items(), key=lambda kv: sum(m.get("time_s") or 0.0 for m in kv[1]), reverse=True):
-            for (b_lo, b_hi) in bins_spec:
-                bt = 0.0
-                for m in ms:
-                    v = m.get("flow_mm3_s") or 0.0
-                    if b_lo <= v < b_hi or (b_hi == bins_spec[-1][1] and b_lo <= v <= b_hi):
-                        bt += m.get("time_s") or 0.0
-                pct = (bt / total_time) if total_time > 0 else None
-                ws_fh.append([t, b_lo, b_hi, bt, pct])
+            t_key = m.get("type") or "UNKNOWN"
+            by_type[t_key].append(m)
+            mt = m["time_s"]
+            type_time[t_key] += mt
+            total_time += mt
+        # One bisect per segment into the bin edges instead of scanning every
+        # segment once per (type, bin) pair. Bins are lo-inclusive with the
+        # top edge folded into the last bin, matching bin_counts.
+        edges = [b_lo for (b_lo, _) in bins_spec]
+        edges.append(bins_spec[-1][1])
+        last_bin = len(bins_spec) - 1
+        for t, ms in sorted(by_type.items(), key=lambda kv: type_time[kv[0]], reverse=True):
+            bt = [0.0] * len(bins_spec)
+            for m in ms:
+                i = bisect.bisect_right(edges, m["flow_mm3_s"]) - 1
+                if i > last_bin:
+                    i = last_bin
+                elif i < 0:
+                    i = 0
+                bt[i] += m["time_s"]
+            for (b_lo, b_hi), b_time in zip(bins_spec, bt):
+                pct = (b_time / total_time) if total_time > 0 else None
+                ws_fh.append([t, b_lo, b_hi, b_time, pct])
     set_basic_column_widths(ws_fh, {"A": 34, "B": 12, "C": 12, "D": 12, "E": 12})
     for cell in ws_fh["E"][1:]:
         cell.number_format = "0.0%"
@@ -659,12 +747,9 @@ def write_xlsx(
     ws_top = wb.create_sheet("Top_Slowest_Layers")
     ws_top.append(["rank", "layer", "time_s", "z_mm", "avg_speed_mm_s", "avg_flow_mm3_s", "avg_fan_pct", "hotend_set_C", "bed_set_C", "chamber_set_C"])
 
-    layer_rows = []
-    for r in ws_layers.iter_rows(min_row=2, values_only=True):
-        # row: layer, z, lh, time, dist, extrusion, avg_speed, avg_flow, peak_speed, p95_speed,
-        #      peak_flow, p95_flow, over_flow_pct, over_speed_pct, avg_fan, hotend, bed, chamber
-        layer_rows.append(r)
-
+    # layer_rows (built during aggregation): layer, z, lh, time, dist, extrusion,
+    # avg_speed, avg_flow, peak/p95/p99 speed, peak/p95/p99 flow, headrooms,
+    # travel/extrude/retract stats, over-limit pcts, avg_fan, hotend, bed, chamber
     layer_rows_sorted = sorted(layer_rows, key=lambda r: (r[3] if r[3] is not None else -1), reverse=True)
     top_n = max(1, int(top_n_slowest))
     for i, r in enumerate(layer_rows_sorted[:top_n], start=1):
@@ -742,6 +827,12 @@ def write_xlsx(
     for idx, name in enumerate(header_row, start=1):
         if name in ("ref_flow_max_mm3_s", "ref_speed_max_mm_s", "ref_layerheight_max_mm"):
             ref_cols[name] = idx
+    # Hoisted once for the chart block below; every speed/flow chart used to
+    # rebuild its own `[ref_cols.get(...)] if ref_cols.get(...) else None`.
+    speed_ref_col = ref_cols.get("ref_speed_max_mm_s")
+    flow_ref_col = ref_cols.get("ref_flow_max_mm3_s")
+    speed_extras = [speed_ref_col] if speed_ref_col else None
+    flow_extras = [flow_ref_col] if flow_ref_col else None
     cats_layers = Reference(ws_layers, min_col=1, min_row=2, max_row=max_layer_row)
 
     # NOTE: openpyxl chart sizes are in "Excel" units (roughly inches).
@@ -768,6 +859,10 @@ def write_xlsx(
         ppr = ParagraphProperties(defRPr=CharacterProperties(sz=sz))
         return RichText(p=[Paragraph(pPr=ppr)])
 
+    # Every axis uses the same 10pt tick-label font; build the RichText tree
+    # once instead of ~2 identical object graphs per chart.
+    axis_rt_10 = _axis_font(10)
+
     def _style_axis(axis):
         # Force axis + tick labels to be shown.
         # Excel can sometimes hide tick labels if an axis is considered unused.
@@ -778,12 +873,8 @@ def write_xlsx(
         axis.minorTickMark = "none"
         # Ensure tick label font is readable and doesn't balloon.
         # 10pt is a good default for Y-axis.
-        try:
-            _rt = _axis_font(10)
-            if _rt is not None:
-                axis.txPr = _rt
-        except Exception:
-            pass
+        if axis_rt_10 is not None:
+            axis.txPr = axis_rt_10
         return axis
 
     def _style_x_axis(axis):
@@ -799,13 +890,7 @@ def write_xlsx(
             pass
         # Avoid rotated, oversized labels (these tend to collide).
         axis.textRotation = 0
-        # Match y-axis tick label size.
-        try:
-            _rt = _axis_font(10)
-            if _rt is not None:
-                axis.txPr = _rt
-        except Exception:
-            pass
+        # Tick label size already applied by _style_axis above.
         return axis
 
     def add_line_chart(title, y_title, min_col, anchor, width=13, height=7, max_col=None, extra_series_cols=None):
@@ -817,6 +902,10 @@ def write_xlsx(
         the font up aggressively. ScatterChart gives us a numeric axis where we can
         control the tick interval (majorUnit) and keep labels readable.
         """
+        # Nothing below the header row (empty/failed print): skip the whole
+        # chart rather than styling axes and series over no data.
+        if max_layer_row < 2:
+            return None
         ch = ScatterChart()
         ch.title = title
         ch.y_axis.title = y_title
@@ -827,16 +916,16 @@ def write_xlsx(
         _style_axis(ch.x_axis)
         ch.legend = None
 
-        # Numeric X values (layer index)
-        xvalues = Reference(ws_layers, min_col=1, min_row=2, max_row=max_layer_row)
-
         def _add_series(col_idx: int):
-            # Use header cell as series title.
+            # Numeric X values (layer index): every per-layer chart shares the
+            # same column-A span, so reuse the cats_layers Reference instead
+            # of rebuilding it per chart.
             yvalues = Reference(ws_layers, min_col=col_idx, min_row=2, max_row=max_layer_row)
             # Use openpyxl's SeriesFactory for cross-version compatibility.
-            s = SeriesFactory(yvalues, xvalues=xvalues, title=None, title_from_data=False)
+            s = SeriesFactory(yvalues, xvalues=cats_layers, title=None, title_from_data=False)
             try:
-                s.title = ws_layers.cell(row=1, column=col_idx).value
+                # Series title from the cached header values, not a cell read.
+                s.title = header_row[col_idx - 1]
             except Exception:
                 pass
             ch.series.append(s)
@@ -893,14 +982,19 @@ def write_xlsx(
     target_labels = 8 if layout == "compact" else 12
     label_skip = max(1, layers_count // max(1, target_labels))
 
-    # Column geometry: tighter for compact, more spacious for wide.
-    base_col_w = 9 if layout == "compact" else 12
-    set_basic_column_widths(ws_dash, {get_column_letter(i): base_col_w for i in range(1, 80)})
-    ws_dash.column_dimensions["A"].width = 5  # left margin for y-axis labels
-
     LEFT = "B"
     RIGHT = "N" if layout == "compact" else "Q"
 
+    # Column geometry: tighter for compact, more spacious for wide. Only the
+    # columns actually carrying anchors/tables need dimension entries — the
+    # old range(1, 80) emitted ~79 ColumnDimension XML nodes, most of them
+    # past anything the dashboard uses. Chart anchor offsets depend only on
+    # columns left of RIGHT, so geometry is unchanged.
+    base_col_w = 9 if layout == "compact" else 12
+    last_dash_col = column_index_from_string(RIGHT)
+    set_basic_column_widths(ws_dash, {get_column_letter(i): base_col_w for i in range(1, last_dash_col + 1)})
+    ws_dash.column_dimensions["A"].width = 5  # left margin for y-axis labels
+
     # Auto-scale chart width by number of layers.
     # More layers => wider charts for readability (without causing overlap).
     # Clamp to a safe range.
@@ -917,48 +1011,37 @@ def write_xlsx(
 
     # Row 1
     time_ch = add_line_chart("Time per Layer (s)", "seconds", 4, f"{LEFT}{R1}", width=CH_W, height=CH_H)
-    speed_ch = add_line_chart("Average Speed per Layer (mm/s)", "mm/s", 7, f"{RIGHT}{R1}", width=CH_W, height=CH_H, extra_series_cols=[ref_cols.get("ref_speed_max_mm_s")] if ref_cols.get("ref_speed_max_mm_s") else None)
-    if ref_cols.get("ref_speed_max_mm_s"):
-        try:
-            speed_ch.y_axis.scaling.max = float(config_info.get("max_print_speed")) * 1.1
-        except Exception:
-            pass
+    speed_ch = add_line_chart("Average Speed per Layer (mm/s)", "mm/s", 7, f"{RIGHT}{R1}", width=CH_W, height=CH_H, extra_series_cols=speed_extras)
+    if speed_ch is not None and speed_ref_col and speed_limit_f is not None:
+        speed_ch.y_axis.scaling.max = speed_limit_f * 1.1
 
     # Row 2
-    flow_ch = add_line_chart("Average Volumetric Flow per Layer (mm³/s)", "mm³/s", 8, f"{LEFT}{R2}", width=CH_W, height=CH_H, extra_series_cols=[ref_cols.get("ref_flow_max_mm3_s")] if ref_cols.get("ref_flow_max_mm3_s") else None)
-    if ref_cols.get("ref_flow_max_mm3_s"):
-        try:
-            flow_ch.y_axis.scaling.max = float(config_info.get("filament_max_volumetric_speed")) * 1.1
-        except Exception:
-            pass
-
-    # Layer height (column)
-    lh_bar = BarChart()
-    lh_bar.type = "col"
-    lh_bar.title = "Layer Height per Layer (mm)"
-    lh_bar.y_axis.title = "mm"
-    # Keep layer height chart scale tight using config.ini max_layer_height when available
-    cfg_layer_h_max = _ini_value_to_float((config_info or {}).get("max_layer_height"))
-    if cfg_layer_h_max is not None:
-        try:
-            lh_bar.y_axis.scaling.max = float(cfg_layer_h_max) * 1.1
-        except Exception:
-            pass
-    if ref_cols.get("ref_layerheight_max_mm") and config_info and config_info.get("max_layer_height") is not None:
-        try:
-            lh_bar.y_axis.scaling.max = float(config_info.get("max_layer_height")) * 1.1
-        except Exception:
-            pass
-    lh_bar.x_axis.title = "layer"
-    _style_axis(lh_bar.y_axis)
-    _style_x_axis(lh_bar.x_axis)
-    lh_bar.legend = None
-    lh_data = Reference(ws_layers, min_col=3, min_row=1, max_row=max_layer_row)
-    lh_bar.add_data(lh_data, titles_from_data=True)
-    lh_bar.set_categories(cats_layers)
-    lh_bar.height = CH_H
-    lh_bar.width = CH_W
-    ws_dash.add_chart(lh_bar, f"{RIGHT}{R2}")
+    flow_ch = add_line_chart("Average Volumetric Flow per Layer (mm³/s)", "mm³/s", 8, f"{LEFT}{R2}", width=CH_W, height=CH_H, extra_series_cols=flow_extras)
+    if flow_ch is not None and flow_ref_col and flow_limit_f is not None:
+        flow_ch.y_axis.scaling.max = flow_limit_f * 1.1
+
+    # Layer height (column); same empty-print guard as add_line_chart.
+    if max_layer_row >= 2:
+        lh_bar = BarChart()
+        lh_bar.type = "col"
+        lh_bar.title = "Layer Height per Layer (mm)"
+        lh_bar.y_axis.title = "mm"
+        # Keep layer height chart scale tight using config.ini max_layer_height when available
+        cfg_layer_h_max = _ini_value_to_float(cfg_max_lh)
+        if cfg_layer_h_max is not None:
+            lh_bar.y_axis.scaling.max = cfg_layer_h_max * 1.1
+        if ref_cols.get("ref_layerheight_max_mm") and max_lh_f is not None:
+            lh_bar.y_axis.scaling.max = max_lh_f * 1.1
+        lh_bar.x_axis.title = "layer"
+        _style_axis(lh_bar.y_axis)
+        _style_x_axis(lh_bar.x_axis)
+        lh_bar.legend = None
+        lh_data = Reference(ws_layers, min_col=3, min_row=1, max_row=max_layer_row)
+        lh_bar.add_data(lh_data, titles_from_data=True)
+        lh_bar.set_categories(cats_layers)
+        lh_bar.height = CH_H
+        lh_bar.width = CH_W
+        ws_dash.add_chart(lh_bar, f"{RIGHT}{R2}")
 
     # Row 3
     add_line_chart("Extrusion per Layer (mm of filament)", "mm", 6, f"{LEFT}{R3}", width=CH_W, height=CH_H)
@@ -1034,36 +1117,27 @@ def write_xlsx(
     # Tuning-focused: worst-case / percentile charts (keep existing averages too)
     # Columns: I peak_speed, J p95_speed, K p99_speed, L peak_flow, M p95_flow, N p99_flow
     peak_sp = add_line_chart("Peak Speed per Layer (mm/s)", "mm/s", 9, f"{LEFT}{R7}", width=CH_W, height=CH_H,
-                             extra_series_cols=[ref_cols.get("ref_speed_max_mm_s")] if ref_cols.get("ref_speed_max_mm_s") else None)
+                             extra_series_cols=speed_extras)
     p95_sp = add_line_chart("P95 Speed per Layer (mm/s)", "mm/s", 10, f"{RIGHT}{R7}", width=CH_W, height=CH_H,
-                            extra_series_cols=[ref_cols.get("ref_speed_max_mm_s")] if ref_cols.get("ref_speed_max_mm_s") else None)
+                            extra_series_cols=speed_extras)
     p99_sp = add_line_chart("P99 Speed per Layer (mm/s)", "mm/s", 11, f"{LEFT}{R8}", width=CH_W, height=CH_H,
-                            extra_series_cols=[ref_cols.get("ref_speed_max_mm_s")] if ref_cols.get("ref_speed_max_mm_s") else None)
+                            extra_series_cols=speed_extras)
     peak_fl = add_line_chart("Peak Volumetric Flow per Layer (mm³/s)", "mm³/s", 12, f"{RIGHT}{R8}", width=CH_W, height=CH_H,
-                             extra_series_cols=[ref_cols.get("ref_flow_max_mm3_s")] if ref_cols.get("ref_flow_max_mm3_s") else None)
+                             extra_series_cols=flow_extras)
     p95_fl = add_line_chart("P95 Volumetric Flow per Layer (mm³/s)", "mm³/s", 13, f"{LEFT}{R9}", width=CH_W, height=CH_H,
-                            extra_series_cols=[ref_cols.get("ref_flow_max_mm3_s")] if ref_cols.get("ref_flow_max_mm3_s") else None)
+                            extra_series_cols=flow_extras)
     p99_fl = add_line_chart("P99 Volumetric Flow per Layer (mm³/s)", "mm³/s", 14, f"{RIGHT}{R9}", width=CH_W, height=CH_H,
-                            extra_series_cols=[ref_cols.get("ref_flow_max_mm3_s")] if ref_cols.get("ref_flow_max_mm3_s") else None)
-
-    # Scale maxima based on config where available
-    if config_info:
-        try:
-            if config_info.get("max_print_speed") is not None:
-                m = float(config_info.get("max_print_speed")) * 1.1
-                peak_sp.y_axis.scaling.max = m
-                p95_sp.y_axis.scaling.max = m
-                p99_sp.y_axis.scaling.max = m
-        except Exception:
-            pass
-        try:
-            if config_info.get("filament_max_volumetric_speed") is not None:
-                m = float(config_info.get("filament_max_volumetric_speed")) * 1.1
-                peak_fl.y_axis.scaling.max = m
-                p95_fl.y_axis.scaling.max = m
-                p99_fl.y_axis.scaling.max = m
-        except Exception:
-            pass
+                            extra_series_cols=flow_extras)
+
+    # Scale maxima based on config where available, one loop per chart group.
+    if speed_limit_f is not None and peak_sp is not None:
+        m = speed_limit_f * 1.1
+        for ch in (peak_sp, p95_sp, p99_sp):
+            ch.y_axis.scaling.max = m
+    if flow_limit_f is not None and peak_fl is not None:
+        m = flow_limit_f * 1.1
+        for ch in (peak_fl, p95_fl, p99_fl):
+            ch.y_axis.scaling.max = m
 
     # Compare mode (experimentation)
     # If multiple compares are provided, we build a summary across all.
@@ -1076,9 +1150,32 @@ def write_xlsx(
 
             Keys: z, layer, time_s, peak_flow, p95_flow, peak_speed, p95_speed
             """
-            by = defaultdict(list)
-            for m in moves_x:
-                by[m["layer"]].append(m)
+            # Moves arrive layer-contiguous from the parser, so group by
+            # slicing run boundaries like the Layers sheet does, instead of
+            # one list append per move; fall back to dict grouping if a layer
+            # index ever reappears out of order.
+            by = {}
+            runs_ok = True
+            cur_layer = None
+            run_start = 0
+            for i, m in enumerate(moves_x):
+                Lx = m["layer"]
+                if Lx != cur_layer:
+                    if cur_layer is not None:
+                        if cur_layer in by:
+                            runs_ok = False
+                            break
+                        by[cur_layer] = moves_x[run_start:i]
+                    cur_layer = Lx
+                    run_start = i
+            if runs_ok and cur_layer is not None:
+                runs_ok = cur_layer not in by
+                if runs_ok:
+                    by[cur_layer] = moves_x[run_start:]
+            if not runs_ok:
+                by = defaultdict(list)
+                for m in moves_x:
+                    by[m["layer"]].append(m)
 
             rows = []
             for Lx, msx in by.items():
@@ -1086,21 +1183,41 @@ def write_xlsx(
                 if z is None:
                     z = msx[-1].get("z")
 
-                t = sum(m.get("time_s", 0.0) or 0.0 for m in msx)
-
-                sp_vals = [m["speed_mm_s"] for m in msx if m.get("speed_mm_s") is not None and (m.get("dist_mm") or 0) > 0]
-                sp_w = [m.get("time_s") or 0.0 for m in msx if m.get("speed_mm_s") is not None and (m.get("dist_mm") or 0) > 0]
-
-                fl_vals = [m["flow_mm3_s"] for m in msx if (m.get("flow_mm3_s") or 0.0) > 0.0]
-                fl_w = [m.get("time_s") or 0.0 for m in msx if (m.get("flow_mm3_s") or 0.0) > 0.0]
-
-                # Filtered peaks to reduce single-move spike noise: ignore segments shorter than min_peak_segment_time_s
-                sp_vals_f = [m["speed_mm_s"] for m in msx if m.get("speed_mm_s") is not None and (m.get("dist_mm") or 0) > 0 and (m.get("time_s") or 0.0) >= min_peak_segment_time_s]
-                fl_vals_f = [m["flow_mm3_s"] for m in msx if (m.get("flow_mm3_s") or 0.0) > 0.0 and (m.get("time_s") or 0.0) >= min_peak_segment_time_s]
-
-                peak_speed = max(sp_vals_f) if sp_vals_f else (max(sp_vals) if sp_vals else None)
+                # One pass over the layer: totals, percentile inputs, and the
+                # spike-filtered peaks together (was ~6 comprehensions).
+                # Compare-run moves may come from another process, so keep the
+                # defensive .get access here.
+                t = 0.0
+                sp_vals = []
+                sp_w = []
+                fl_vals = []
+                fl_w = []
+                peak_speed_f = None
+                peak_flow_f = None
+                for m in msx:
+                    mt = m.get("time_s", 0.0) or 0.0
+                    t += mt
+                    msp = m.get("speed_mm_s")
+                    if msp is not None and (m.get("dist_mm") or 0) > 0:
+                        sp_vals.append(msp)
+                        sp_w.append(mt)
+                        # Filtered peak: ignore segments shorter than min_peak_segment_time_s
+                        if mt >= min_peak_segment_time_s and (peak_speed_f is None or msp > peak_speed_f):
+                            peak_speed_f = msp
+                    mfl = m.get("flow_mm3_s") or 0.0
+                    if mfl > 0.0:
+                        fl_vals.append(mfl)
+                        fl_w.append(mt)
+                        if mt >= min_peak_segment_time_s and (peak_flow_f is None or mfl > peak_flow_f):
+                            peak_flow_f = mfl
+
+                # Raw (unfiltered) peaks feed the Compare_Summary maxima; the
+                # chart series prefer the spike-filtered peaks when available.
+                peak_speed_raw = max(sp_vals) if sp_vals else None
+                peak_flow_raw = max(fl_vals) if fl_vals else None
+                peak_speed = peak_speed_f if peak_speed_f is not None else peak_speed_raw
                 p95_speed = weighted_quantile(sp_vals, sp_w, 0.95) if sp_vals else None
-                peak_flow = max(fl_vals_f) if fl_vals_f else (max(fl_vals) if fl_vals else None)
+                peak_flow = peak_flow_f if peak_flow_f is not None else peak_flow_raw
                 p95_flow = weighted_quantile(fl_vals, fl_w, 0.95) if fl_vals else None
 
                 rows.append({
@@ -1111,53 +1228,59 @@ def write_xlsx(
                     "p95_flow": p95_flow,
                     "peak_speed": peak_speed,
                     "p95_speed": p95_speed,
+                    "peak_flow_raw": peak_flow_raw,
+                    "peak_speed_raw": peak_speed_raw,
                 })
 
             rows.sort(key=lambda r: (float('inf') if r["z"] is None else r["z"]))
             return rows
 
-        def _interp_by_z(rows, z_query):
-            """Linear interpolation of a metric over Z.
+        def _interp_series(rows, z_queries):
+            """Linear interpolation of per-layer metrics at every query Z.
 
-            For per-layer series, we treat the value at each layer's Z and interpolate between adjacent Zs.
-            If z_query is outside the known range, returns None.
+            For per-layer series, we treat the value at each layer's Z and
+            interpolate between adjacent Zs. Both `rows` and `z_queries` are
+            Z-ascending, so one merged sweep answers all queries — the old
+            per-query helper re-scanned the full series each call, which made
+            the compare table quadratic in layer count. Out-of-range queries
+            yield None entries.
             """
-            pts = [(r["z"], r) for r in rows if r.get("z") is not None]
+            pts = [r for r in rows if r.get("z") is not None]
+            out = [None] * len(z_queries)
             if not pts:
-                return None
-            zs = [z for z, _ in pts]
-            if z_query < zs[0] or z_query > zs[-1]:
-                return None
-            # exact match
-            for z, rr in pts:
-                if z == z_query:
-                    return rr
-            # find neighbors
-            lo_i = 0
-            hi_i = len(pts) - 1
-            # binary search for insertion point
-            import bisect
-            idx = bisect.bisect_left(zs, z_query)
-            if idx <= 0:
-                return pts[0][1]
-            if idx >= len(pts):
-                return pts[-1][1]
-            z0, r0 = pts[idx - 1]
-            z1, r1 = pts[idx]
-            if z1 == z0:
-                return r1
-            t = (z_query - z0) / (z1 - z0)
-            out = {"z": z_query}
-            # interpolate numeric keys
-            for k in ("time_s", "peak_flow", "p95_flow", "peak_speed", "p95_speed"):
-                v0 = r0.get(k)
-                v1 = r1.get(k)
-                if v0 is None or v1 is None:
-                    out[k] = None
-                else:
-                    out[k] = (1 - t) * float(v0) + t * float(v1)
-            # layer number: nearest by Z
-            out["layer"] = r0.get("layer") if (z_query - z0) <= (z1 - z_query) else r1.get("layer")
+                return out
+            zs = [r["z"] for r in pts]
+            z_lo = zs[0]
+            z_hi = zs[-1]
+            n = len(pts)
+            keys = ("time_s", "peak_flow", "p95_flow", "peak_speed", "p95_speed")
+            idx = 0
+            for qi, zq in enumerate(z_queries):
+                if zq < z_lo or zq > z_hi:
+                    continue
+                while idx < n and zs[idx] < zq:
+                    idx += 1
+                if zs[idx] == zq:
+                    # exact match: reuse the layer's own row
+                    out[qi] = pts[idx]
+                    continue
+                z0 = zs[idx - 1]
+                z1 = zs[idx]
+                r0 = pts[idx - 1]
+                r1 = pts[idx]
+                t = (zq - z0) / (z1 - z0)
+                o = {"z": zq}
+                # interpolate numeric keys
+                for k in keys:
+                    v0 = r0.get(k)
+                    v1 = r1.get(k)
+                    if v0 is None or v1 is None:
+                        o[k] = None
+                    else:
+                        o[k] = (1 - t) * float(v0) + t * float(v1)
+                # layer number: nearest by Z
+                o["layer"] = r0.get("layer") if (zq - z0) <= (z1 - zq) else r1.get("layer")
+                out[qi] = o
             return out
 
         # Build Z-aligned comparison for the first compare run (overlay charts).
@@ -1179,8 +1302,11 @@ def write_xlsx(
         sp_lim_a = _to_float(a_cfg.get("max_print_speed"))
         sp_lim_b = _to_float(b_cfg.get("max_print_speed"))
 
+        # One aggregation per run; the Compare_Summary dicts below are views
+        # over these same rows.
         A_rows = _layer_stats_series(moves, layer_z_map)
-        B_rows = _layer_stats_series(first["moves"], first["layer_z_map"])
+        b_rows_all = [_layer_stats_series(r["moves"], r["layer_z_map"]) for r in compare_runs]
+        B_rows = b_rows_all[0]
 
         zA = [r["z"] for r in A_rows if r.get("z") is not None]
         zB = [r["z"] for r in B_rows if r.get("z") is not None]
@@ -1193,16 +1319,19 @@ def write_xlsx(
             f"{A_label}_limit_y", f"{B_label}_limit_y",
         ])
 
-        # Fill data rows
-        for z in z_common:
-            a = _interp_by_z(A_rows, z)
-            b = _interp_by_z(B_rows, z)
-            ws_cb.append([
-                z,
-                a.get("layer") if a else None, a.get("time_s") if a else None, a.get("peak_flow") if a else None, a.get("p95_flow") if a else None, a.get("peak_speed") if a else None,
-                b.get("layer") if b else None, b.get("time_s") if b else None, b.get("peak_flow") if b else None, b.get("p95_flow") if b else None, b.get("peak_speed") if b else None,
-                None, None,
-            ])
+        # Fill data rows. Each run contributes the same five columns, pulled
+        # with one itemgetter call per row half instead of five chained
+        # conditional .get expressions.
+        run_cols = itemgetter("layer", "time_s", "peak_flow", "p95_flow", "peak_speed")
+        empty_cols = (None, None, None, None, None)
+        a_interp = _interp_series(A_rows, z_common)
+        b_interp = _interp_series(B_rows, z_common)
+        for z, a, b in zip(z_common, a_interp, b_interp):
+            row = [z]
+            row.extend(run_cols(a) if a else empty_cols)
+            row.extend(run_cols(b) if b else empty_cols)
+            row.extend((None, None))
+            ws_cb.append(row)
 
         data_end_row = ws_cb.max_row
 
@@ -1220,9 +1349,36 @@ def write_xlsx(
             header.extend([r.get("label") or Path(r.get("path","B")).stem, "Delta"])
         ws_cs.append(header)
 
-        def _sum_or_none(d, key):
-            vals = [v.get(key) for v in d.values() if v.get(key) is not None]
-            return sum(vals) if vals else None
+        def _run_summary(rows):
+            """Total time and the four Compare_Summary maxima in one pass.
+
+            None metrics count as 0 toward the maxima and maxima use the raw
+            (unfiltered) peaks, matching the old per-metric generator walks;
+            an empty run yields all-None.
+            """
+            if not rows:
+                return {"time_s": None, "peak_flow": None, "p95_flow": None,
+                        "peak_speed": None, "p95_speed": None}
+            t = None
+            peak_fl = p95_fl = peak_sp = p95_sp = 0
+            for r in rows:
+                rt = r["time_s"]
+                if rt is not None:
+                    t = rt if t is None else t + rt
+                v = r["peak_flow_raw"] or 0
+                if v > peak_fl:
+                    peak_fl = v
+                v = r["p95_flow"] or 0
+                if v > p95_fl:
+                    p95_fl = v
+                v = r["peak_speed_raw"] or 0
+                if v > peak_sp:
+                    peak_sp = v
+                v = r["p95_speed"] or 0
+                if v > p95_sp:
+                    p95_sp = v
+            return {"time_s": t, "peak_flow": peak_fl, "p95_flow": p95_fl,
+                    "peak_speed": peak_sp, "p95_speed": p95_sp}
 
         def _metric_row(label, aval, bvals):
             row = [label, aval]
@@ -1234,54 +1390,16 @@ def write_xlsx(
                     row.append(None)
             return row
 
-        def _layer_stats_from_moves(moves_x, layer_z_x):
-            """Aggregate per-layer stats into a dict keyed by layer index.
-
-            Values include:
-              - time_s
-              - peak_flow, p95_flow
-              - peak_speed, p95_speed
-
-            Percentiles are time-weighted.
-            """
-            by = defaultdict(list)
-            for m in moves_x:
-                by[m["layer"]].append(m)
-
-            out = {}
-            for Lx, msx in by.items():
-                t = sum(m.get("time_s", 0.0) or 0.0 for m in msx)
-                sp_vals = [m["speed_mm_s"] for m in msx if m.get("speed_mm_s") is not None and (m.get("dist_mm") or 0) > 0]
-                sp_w = [m.get("time_s") or 0.0 for m in msx if m.get("speed_mm_s") is not None and (m.get("dist_mm") or 0) > 0]
-                fl_vals = [m["flow_mm3_s"] for m in msx if (m.get("flow_mm3_s") or 0.0) > 0.0]
-                fl_w = [m.get("time_s") or 0.0 for m in msx if (m.get("flow_mm3_s") or 0.0) > 0.0]
-
-                out[Lx] = {
-                    "z": layer_z_x.get(Lx, msx[-1].get("z")),
-                    "time_s": t,
-                    "peak_flow": max(fl_vals) if fl_vals else None,
-                    "p95_flow": weighted_quantile(fl_vals, fl_w, 0.95) if fl_vals else None,
-                    "peak_speed": max(sp_vals) if sp_vals else None,
-                    "p95_speed": weighted_quantile(sp_vals, sp_w, 0.95) if sp_vals else None,
-                }
-            return out
-
-        # Totals and maxima for each compare
-        A_dict = _layer_stats_from_moves(moves, layer_z_map)
-        total_a = _sum_or_none(A_dict, "time_s")
-        b_dicts = [_layer_stats_from_moves(r["moves"], r["layer_z_map"]) for r in compare_runs]
-        totals_b = [_sum_or_none(d, "time_s") for d in b_dicts]
-        ws_cs.append(_metric_row("Total time (s)", total_a, totals_b))
-
-        def _max_key(d, key):
-            if not d:
-                return None
-            return max((v.get(key) or 0) for v in d.values())
-
-        ws_cs.append(_metric_row("Max peak flow (mm³/s)", _max_key(A_dict, "peak_flow"), [_max_key(d, "peak_flow") for d in b_dicts]))
-        ws_cs.append(_metric_row("Max P95 flow (mm³/s)", _max_key(A_dict, "p95_flow"), [_max_key(d, "p95_flow") for d in b_dicts]))
-        ws_cs.append(_metric_row("Max peak speed (mm/s)", _max_key(A_dict, "peak_speed"), [_max_key(d, "peak_speed") for d in b_dicts]))
-        ws_cs.append(_metric_row("Max P95 speed (mm/s)", _max_key(A_dict, "p95_speed"), [_max_key(d, "p95_speed") for d in b_dicts]))
+        # Totals and maxima for each compare, from the per-run stats already
+        # aggregated above (these used to come from a second full walk over
+        # every run's moves, then one more generator walk per metric).
+        a_sum = _run_summary(A_rows)
+        b_sums = [_run_summary(rows) for rows in b_rows_all]
+        ws_cs.append(_metric_row("Total time (s)", a_sum["time_s"], [s["time_s"] for s in b_sums]))
+        ws_cs.append(_metric_row("Max peak flow (mm³/s)", a_sum["peak_flow"], [s["peak_flow"] for s in b_sums]))
+        ws_cs.append(_metric_row("Max P95 flow (mm³/s)", a_sum["p95_flow"], [s["p95_flow"] for s in b_sums]))
+        ws_cs.append(_metric_row("Max peak speed (mm/s)", a_sum["peak_speed"], [s["peak_speed"] for s in b_sums]))
+        ws_cs.append(_metric_row("Max P95 speed (mm/s)", a_sum["p95_speed"], [s["p95_speed"] for s in b_sums]))
 
         # Widths
         widths = {"A": 26, "B": 14}
@@ -1314,18 +1432,19 @@ def write_xlsx(
                 nice = 10
             return nice * (10 ** exp)
 
-        # Determine X axis range from Z (common axis)
-        max_z = None
-        try:
-            vals = [r[0] for r in ws_cb.iter_rows(min_row=2, min_col=1, max_col=1, values_only=True) if r[0] is not None]
-            max_z = max(vals) if vals else None
-        except Exception:
-            max_z = None
+        # Determine X axis range from Z (common axis). z_common is already
+        # sorted ascending and None-free, and it is exactly what column A was
+        # filled from — no need to read the cells back out of the sheet.
+        max_z = z_common[-1] if z_common else None
 
         major = _nice_major_unit(max_z, target_ticks=7)
 
-        # We keep helper points below the data table so charts can reference 2-point constant limit lines
+        # We keep helper points below the data table so charts can reference 2-point constant limit lines.
+        # Blank spacer row between the data table and the first helper block;
+        # each chart then appends its own fixed 3-row block below, so the
+        # helper rows stay deterministic for the chart References.
         helper_row = (data_end_row or ws_cb.max_row) + 2
+        ws_cb.append(())
 
         def _add_compare_scatter(title, y_title, col_ay, col_by, anchor, limit_a=None, limit_b=None):
             nonlocal helper_row
@@ -1358,25 +1477,30 @@ def write_xlsx(
             s_b = Series(y_b, x_ref, title_from_data=True)
             ch.series.append(s_b)
 
-            # Optional per-run limit reference lines (2-point scatter)
+            # Optional per-run limit reference lines (2-point scatter).
+            # Dict-form append creates only the needed cells, unlike the
+            # per-cell ws.cell writes this replaces.
+            row1 = {}
+            row2 = {}
             if limit_a is not None:
-                ws_cb.cell(row=helper_row, column=1, value=0.0)
-                ws_cb.cell(row=helper_row+1, column=1, value=max_z)
-                ws_cb.cell(row=helper_row, column=12, value=float(limit_a))
-                ws_cb.cell(row=helper_row+1, column=12, value=float(limit_a))
+                row1[1] = 0.0
+                row2[1] = max_z
+                row1[12] = row2[12] = float(limit_a)
                 y_lim_a = Reference(ws_cb, min_col=12, min_row=helper_row, max_row=helper_row+1)
                 x_lim = Reference(ws_cb, min_col=1, min_row=helper_row, max_row=helper_row+1)
                 s_la = Series(y_lim_a, x_lim, title=f"{A_label}_limit")
                 ch.series.append(s_la)
 
             if limit_b is not None:
-                ws_cb.cell(row=helper_row, column=13, value=float(limit_b))
-                ws_cb.cell(row=helper_row+1, column=13, value=float(limit_b))
+                row1[13] = row2[13] = float(limit_b)
                 y_lim_b = Reference(ws_cb, min_col=13, min_row=helper_row, max_row=helper_row+1)
                 x_lim = Reference(ws_cb, min_col=1, min_row=helper_row, max_row=helper_row+1)
                 s_lb = Series(y_lim_b, x_lim, title=f"{B_label}_limit")
                 ch.series.append(s_lb)
 
+            ws_cb.append(row1)
+            ws_cb.append(row2)
+            ws_cb.append(())
             helper_row += 3
 
             # Layout
@@ -1392,45 +1516,70 @@ def write_xlsx(
 
         # "Two x-axis scales" helper table (Z -> A layer, B layer) for major tick positions.
         try:
-            if major is None:
-                major_local = _nice_major_unit(max_z, target_ticks=7)
-            else:
-                major_local = major
-            if major_local and max_z is not None:
-                def _nearest_layer(rows, z_target):
-                    best = None
+            # `major` was already computed from max_z with the same target
+            # tick count; recomputing it here could only return the same
+            # value (or None again).
+            if major and max_z is not None:
+                def _tick_layer_lookup(rows):
+                    # Build the Z/layer arrays once per run (rows are already
+                    # Z-ascending, None Zs sorted last); each tick is then a
+                    # binary search instead of a full rescan of the rows.
+                    zs = []
+                    layers = []
                     for rr in rows:
-                        z = rr.get("z") if isinstance(rr, dict) else None
-                        layer = rr.get("layer") if isinstance(rr, dict) else None
+                        z = rr.get("z")
                         if z is None:
                             continue
-                        dz = abs(float(z) - float(z_target))
-                        if best is None or dz < best[0]:
-                            best = (dz, layer)
-                    return best[1] if best else None
+                        zs.append(float(z))
+                        layers.append(rr.get("layer"))
+
+                    def nearest(z_target):
+                        if not zs:
+                            return None
+                        zt = float(z_target)
+                        i = bisect.bisect_left(zs, zt)
+                        if i == len(zs):
+                            i = len(zs) - 1
+                        elif i > 0 and zt - zs[i - 1] <= zs[i] - zt:
+                            # on a distance tie the lower Z wins, like the old scan
+                            i -= 1
+                        # and among duplicate Zs, the first layer wins
+                        return layers[bisect.bisect_left(zs, zs[i])]
+
+                    return nearest
+
+                nearest_a = _tick_layer_lookup(A_rows)
+                nearest_b = _tick_layer_lookup(B_rows)
 
                 ticks = []
                 zt = 0.0
                 while zt <= float(max_z) + 1e-9:
                     ticks.append(round(zt, 6))
-                    zt += float(major_local)
+                    zt += float(major)
+
+                # Address the table by (row, column) index instead of A1
+                # strings: ws[f"{col}{row}"] re-parses the coordinate per
+                # cell. One shared fill/alignment object serves every header
+                # cell (styles are immutable, so sharing is safe).
+                left_col = column_index_from_string(LEFT)
+                right_col = column_index_from_string(RIGHT)
+                mid_col = (left_col + right_col) // 2
+                header_fill = PatternFill("solid", fgColor="DDDDDD")
+                cell = ws_dash.cell
 
                 table_row = compare_r2 + int(CH_H * 2) + 3
-                ws_dash[f"{LEFT}{table_row}"] = "Compare X-axis scales (by Z tick)"
-                ws_dash[f"{LEFT}{table_row}"].alignment = Alignment(horizontal="left")
-                ws_dash[f"{LEFT}{table_row+1}"] = "Z (mm)"
-                ws_dash[f"{LEFT}{table_row+1}"].alignment = Alignment(horizontal="left")
-                ws_dash[f"{LEFT}{table_row+1}"].fill = PatternFill("solid", fgColor="DDDDDD")
-                ws_dash[f"{MIDDLE}{table_row+1}"] = "A layer"
-                ws_dash[f"{MIDDLE}{table_row+1}"].fill = PatternFill("solid", fgColor="DDDDDD")
-                ws_dash[f"{RIGHT}{table_row+1}"] = "B layer"
-                ws_dash[f"{RIGHT}{table_row+1}"].fill = PatternFill("solid", fgColor="DDDDDD")
+                cell(row=table_row, column=left_col, value="Compare X-axis scales (by Z tick)").alignment = Alignment(horizontal="left")
+                zc = cell(row=table_row + 1, column=left_col, value="Z (mm)")
+                zc.alignment = Alignment(horizontal="left")
+                zc.fill = header_fill
+                cell(row=table_row + 1, column=mid_col, value="A layer").fill = header_fill
+                cell(row=table_row + 1, column=right_col, value="B layer").fill = header_fill
 
                 r = table_row + 2
                 for ztick in ticks[:20]:  # keep it compact
-                    ws_dash[f"{LEFT}{r}"] = ztick
-                    ws_dash[f"{MIDDLE}{r}"] = _nearest_layer(A_rows, ztick)
-                    ws_dash[f"{RIGHT}{r}"] = _nearest_layer(B_rows, ztick)
+                    cell(row=r, column=left_col, value=ztick)
+                    cell(row=r, column=mid_col, value=nearest_a(ztick))
+                    cell(row=r, column=right_col, value=nearest_b(ztick))
                     r += 1
         except Exception:
             pass
@@ -1441,8 +1590,6 @@ def write_xlsx(
 
 def _aggregate_layers_for_export(moves, layer_z_map, config_info=None):
     """Return list of dict rows matching the Layers sheet schema (subset).
-    if RichText is None:
-        return None
 
     This is used for CSV/JSON sidecars and tests. Keep it lightweight and stable.
     """
@@ -1450,6 +1597,11 @@ def _aggregate_layers_for_export(moves, layer_z_map, config_info=None):
     for m in moves:
         by_layer[m["layer"]].append(m)
 
+    # The limits are per-run constants; resolve (and float-coerce) them once
+    # here instead of re-fetching from the config dict for every layer.
+    flow_limit = _ini_value_to_float((config_info or {}).get("filament_max_volumetric_speed"))
+    speed_limit = _ini_value_to_float((config_info or {}).get("max_print_speed"))
+
     prev_z = None
     out = []
     for L in sorted(by_layer.keys()):
@@ -1459,52 +1611,62 @@ def _aggregate_layers_for_export(moves, layer_z_map, config_info=None):
         if z_val is not None:
             prev_z = z_val
 
-        t = sum(m.get("time_s") or 0.0 for m in ms)
-        d = sum(m.get("dist_mm") or 0.0 for m in ms)
-        e_pos = sum((m.get("de_mm") or 0.0) for m in ms if (m.get("de_mm") or 0.0) > 0.0)
-
-        sp_vals = [m["speed_mm_s"] for m in ms if m.get("speed_mm_s") is not None and (m.get("dist_mm") or 0.0) > 0.0]
-        sp_w = [m.get("time_s") or 0.0 for m in ms if m.get("speed_mm_s") is not None and (m.get("dist_mm") or 0.0) > 0.0]
-        fl_vals = [m["flow_mm3_s"] for m in ms if (m.get("flow_mm3_s") or 0.0) > 0.0]
-        fl_w = [m.get("time_s") or 0.0 for m in ms if (m.get("flow_mm3_s") or 0.0) > 0.0]
+        # One pass per layer gathers every sum, count, and quantile input;
+        # this used to be ~10 separate comprehensions over the same moves.
+        t = 0.0
+        d = 0.0
+        e_pos = 0.0
+        travel_time = 0.0
+        travel_dist = 0.0
+        extrude_time = 0.0
+        retract_count = 0
+        retract_mm = 0.0
+        short_fast = 0
+        flow_time = 0.0
+        sp_vals = []
+        sp_w = []
+        fl_vals = []
+        fl_w = []
+        # parse_gcode guarantees the numeric fields are never None, so no
+        # `or 0.0` coalescing here; only speed can be missing.
+        for m in ms:
+            mt = m["time_s"]
+            md = m["dist_mm"]
+            de = m["de_mm"]
+            fl = m["flow_mm3_s"]
+            sp = m["speed_mm_s"]
+            t += mt
+            d += md
+            flow_time += fl * mt
+            if de > 0.0:
+                e_pos += de
+                if mt > 0.0:
+                    extrude_time += mt
+                if 0.0 < md < 0.6 and (sp or 0.0) > 50.0:
+                    short_fast += 1
+            elif de < 0.0:
+                retract_count += 1
+                retract_mm -= de
+            elif md > 0.0:
+                travel_time += mt
+                travel_dist += md
+            if sp is not None and md > 0.0:
+                sp_vals.append(sp)
+                sp_w.append(mt)
+            if fl > 0.0:
+                fl_vals.append(fl)
+                fl_w.append(mt)
 
         peak_speed = max(sp_vals) if sp_vals else None
-        p95_speed = weighted_quantile(sp_vals, sp_w, 0.95) if sp_vals else None
-        p99_speed = weighted_quantile(sp_vals, sp_w, 0.99) if sp_vals else None
+        p95_speed, p99_speed = weighted_quantiles(sp_vals, sp_w, (0.95, 0.99))
         peak_flow = max(fl_vals) if fl_vals else None
-        p95_flow = weighted_quantile(fl_vals, fl_w, 0.95) if fl_vals else None
-        p99_flow = weighted_quantile(fl_vals, fl_w, 0.99) if fl_vals else None
-
-        flow_limit = (config_info or {}).get("filament_max_volumetric_speed")
-        speed_limit = (config_info or {}).get("max_print_speed")
-        flow_headroom = None
-        speed_headroom = None
-        try:
-            if flow_limit is not None and p99_flow is not None:
-                flow_headroom = float(flow_limit) - float(p99_flow)
-        except Exception:
-            pass
-        try:
-            if speed_limit is not None and p99_speed is not None:
-                speed_headroom = float(speed_limit) - float(p99_speed)
-        except Exception:
-            pass
+        p95_flow, p99_flow = weighted_quantiles(fl_vals, fl_w, (0.95, 0.99))
 
-        travel_time = sum(m.get("time_s") or 0.0 for m in ms if (m.get("de_mm") or 0.0) == 0.0 and (m.get("dist_mm") or 0.0) > 0.0)
-        travel_dist = sum(m.get("dist_mm") or 0.0 for m in ms if (m.get("de_mm") or 0.0) == 0.0 and (m.get("dist_mm") or 0.0) > 0.0)
-        extrude_time = sum(m.get("time_s") or 0.0 for m in ms if (m.get("de_mm") or 0.0) > 0.0 and (m.get("time_s") or 0.0) > 0.0)
-        retract_moves = [m for m in ms if (m.get("de_mm") or 0.0) < 0.0]
-        retract_count = len(retract_moves)
-        retract_mm = -sum(m.get("de_mm") or 0.0 for m in retract_moves)
-
-        short_fast = 0
-        for m in ms:
-            if (m.get("de_mm") or 0.0) > 0.0 and (m.get("dist_mm") or 0.0) > 0.0:
-                if (m.get("dist_mm") or 0.0) < 0.6 and (m.get("speed_mm_s") or 0.0) > 50.0:
-                    short_fast += 1
+        flow_headroom = (flow_limit - p99_flow) if (flow_limit is not None and p99_flow is not None) else None
+        speed_headroom = (speed_limit - p99_speed) if (speed_limit is not None and p99_speed is not None) else None
 
         avg_speed = (d / t) if t > 0 else None
-        avg_flow = (sum((m.get("flow_mm3_s") or 0.0) * (m.get("time_s") or 0.0) for m in ms) / t) if t > 0 else None
+        avg_flow = (flow_time / t) if t > 0 else None
 
         out.append(
             {
@@ -1536,9 +1698,14 @@ def _aggregate_layers_for_export(moves, layer_z_map, config_info=None):
     return out
 
 
-def build_json_summary(moves, layer_z_map, config_info=None):
-    """Build a small, regression-friendly summary object."""
-    layers = _aggregate_layers_for_export(moves, layer_z_map, config_info=config_info)
+def build_json_summary(moves, layer_z_map, config_info=None, layers=None):
+    """Build a small, regression-friendly summary object.
+
+    `layers` lets callers that also run `write_csv_exports` pass the shared
+    per-layer aggregation instead of recomputing it.
+    """
+    if layers is None:
+        layers = _aggregate_layers_for_export(moves, layer_z_map, config_info=config_info)
     total_time_s = sum(r["time_s"] for r in layers)
     total_travel_time_s = sum(r["travel_time_s"] for r in layers)
     total_extrude_time_s = sum(r["extrude_time_s"] for r in layers)
@@ -1569,15 +1736,20 @@ def build_json_summary(moves, layer_z_map, config_info=None):
     }
 
 
-def write_csv_exports(moves, layer_z_map, out_xlsx_path: str, config_info=None, top_n_segments: int = 200):
-    """Write CSV exports next to the XLSX (layers + top segments + feature histogram)."""
+def write_csv_exports(moves, layer_z_map, out_xlsx_path: str, config_info=None, top_n_segments: int = 200, layers=None):
+    """Write CSV exports next to the XLSX (layers + top segments + feature histogram).
+
+    `layers` lets callers that also run `build_json_summary` pass the shared
+    per-layer aggregation instead of recomputing it.
+    """
     import csv
 
     out_xlsx = Path(out_xlsx_path)
     base = out_xlsx.with_suffix("")
 
     # Layers
-    layers = _aggregate_layers_for_export(moves, layer_z_map, config_info=config_info)
+    if layers is None:
+        layers = _aggregate_layers_for_export(moves, layer_z_map, config_info=config_info)
     layers_path = base.with_name(base.name + "_layers.csv")
     if layers:
         with open(layers_path, "w", newline="", encoding="utf-8") as f:
@@ -1586,8 +1758,12 @@ def write_csv_exports(moves, layer_z_map, out_xlsx_path: str, config_info=None,
             w.writerows(layers)
 
     # Top flow segments
-    segs = [m for m in moves if (m.get("de_mm") or 0.0) > 0.0 and (m.get("time_s") or 0.0) > 0.0 and (m.get("flow_mm3_s") or 0.0) > 0.0]
-    segs.sort(key=lambda m: (m.get("flow_mm3_s") or 0.0), reverse=True)
+    # The numeric fields are guaranteed non-None by parse_gcode.
+    segs = [m for m in moves if m["de_mm"] > 0.0 and m["time_s"] > 0.0 and m["flow_mm3_s"] > 0.0]
+    # Only the top N segments are written, so an O(n log k) selection beats
+    # sorting the whole list; ties keep input order just like the stable sort
+    # did. `segs` itself stays unsorted for the histogram below.
+    top_segs = heapq.nlargest(max(1, int(top_n_segments)), segs, key=itemgetter("flow_mm3_s"))
     seg_path = base.with_name(base.name + "_top_flow_segments.csv")
     with open(seg_path, "w", newline="", encoding="utf-8") as f:
         fieldnames = [
@@ -1595,7 +1771,7 @@ def write_csv_exports(moves, layer_z_map, out_xlsx_path: str, config_info=None,
         ]
         w = csv.DictWriter(f, fieldnames=fieldnames)
         w.writeheader()
-        for idx, m in enumerate(segs[:max(1, int(top_n_segments))], start=1):
+        for idx, m in enumerate(top_segs, start=1):
             w.writerow(
                 {
                     "rank": idx,
@@ -1620,24 +1796,39 @@ def write_csv_exports(moves, layer_z_map, out_xlsx_path: str, config_info=None,
     if flow_values:
         lo = 0.0
         hi = max(flow_values)
-        if (config_info or {}).get("filament_max_volumetric_speed") is not None:
-            try:
-                hi = max(hi, float((config_info or {}).get("filament_max_volumetric_speed")))
-            except Exception:
-                pass
+        cfg_flow_limit = _ini_value_to_float((config_info or {}).get("filament_max_volumetric_speed"))
+        if cfg_flow_limit is not None:
+            hi = max(hi, cfg_flow_limit)
         bins_spec = make_bins(lo, hi, 20)
-        total_time = sum(m.get("time_s") or 0.0 for m in segs)
-        by_type = defaultdict(list)
+        total_time = sum(m["time_s"] for m in segs)
+        # One binning pass over the segments instead of rescanning every move
+        # per (type, bin) pair: binary-search the shared bin edges like
+        # bin_counts does and accumulate time into a per-type bin array. Every
+        # flow here is > lo and <= hi by construction, so only the inclusive
+        # top edge needs the clamp.
+        edges = [b_lo for b_lo, _ in bins_spec]
+        edges.append(bins_spec[-1][1])
+        last_bin = len(bins_spec) - 1
+        bin_time = {}
+        type_time = {}
         for m in segs:
-            by_type[m.get("type") or "UNKNOWN"].append(m)
+            t = m["type"] or "UNKNOWN"
+            arr = bin_time.get(t)
+            if arr is None:
+                arr = bin_time[t] = [0.0] * len(bins_spec)
+                type_time[t] = 0.0
+            v = m["flow_mm3_s"]
+            i = bisect.bisect_right(edges, v) - 1
+            if i > last_bin:
+                i = last_bin
+            mt = m["time_s"]
+            arr[i] += mt
+            type_time[t] += mt
         rows = []
-        for t, ms in sorted(by_type.items(), key=lambda kv: sum(m.get("time_s") or 0.0 for m in kv[1]), reverse=True):
-            for (b_lo, b_hi) in bins_spec:
-                bt = 0.0
-                for m in ms:
-                    v = m.get("flow_mm3_s") or 0.0
-                    if b_lo <= v < b_hi or (b_hi == bins_spec[-1][1] and b_lo <= v <= b_hi):
-                        bt += m.get("time_s") or 0.0
+        for t, _tt in sorted(type_time.items(), key=itemgetter(1), reverse=True):
+            arr = bin_time[t]
+            for bi, (b_lo, b_hi) in enumerate(bins_spec):
+                bt = arr[bi]
                 rows.append({"type": t, "bin_lo": b_lo, "bin_hi": b_hi, "time_s": bt, "time_pct": (bt / total_time) if total_time > 0 else None})
         with open(fh_path, "w", newline="", encoding="utf-8") as f:
             w = csv.DictWriter(f, fieldnames=["type", "bin_lo", "bin_hi", "time_s", "time_pct"])
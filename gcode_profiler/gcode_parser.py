@@ -1,54 +1,47 @@
 import math
 import re
 
+# Historical home of the binning helpers; stats.py owns the single
+# implementation now.
+from .stats import make_bins, bin_counts
+
+
+# Compiled once at import (a --compare run parses several files with one
+# interpreter); re.ASCII keeps \s/\d matching to the byte classes G-code
+# actually uses instead of the full Unicode tables.
+_RE_TYPE = re.compile(r";\s*TYPE:(.+)\s*$", re.ASCII)
+_RE_Z = re.compile(r";\s*Z:([0-9.+-]+)", re.ASCII)
+_RE_LAYER = re.compile(r";\s*LAYER:\s*([0-9]+)", re.ASCII)
+
+_RE_G0G1 = re.compile(r"^(G0|G1)\s+(.*)$", re.ASCII)
+_RE_PARAM = re.compile(r"([XYZEFS])([0-9.+-]+)", re.ASCII)
+
+
 def filament_area_mm2(d_mm: float) -> float:
     r = d_mm / 2.0
     return math.pi * r * r
 
 
-def make_bins(min_v: float, max_v: float, bins: int):
-    if bins < 1:
-        bins = 1
-    if max_v < min_v:
-        min_v, max_v = max_v, min_v
-    if math.isclose(max_v, min_v):
-        return [(min_v, max_v)]
-    step = (max_v - min_v) / bins
-    out = []
-    lo = min_v
-    for i in range(bins):
-        hi = (min_v + (i + 1) * step) if i < bins - 1 else max_v
-        out.append((lo, hi))
-        lo = hi
-    return out
-
-
-def bin_counts(values, bins_spec):
-    """Return counts per bin. bins_spec is list[(lo, hi)], inclusive lo, exclusive hi except last."""
-    counts = [0] * len(bins_spec)
-    if not bins_spec:
-        return counts
-    for v in values:
-        if v is None:
-            continue
-        placed = False
-        for i, (lo, hi) in enumerate(bins_spec):
-            if i < len(bins_spec) - 1:
-                if lo <= v < hi:
-                    counts[i] += 1
-                    placed = True
-                    break
-            else:
-                if lo <= v <= hi:
-                    counts[i] += 1
-                    placed = True
-                    break
-        if not placed:
-            if v < bins_spec[0][0]:
-                counts[0] += 1
-            else:
-                counts[-1] += 1
-    return counts
+def _first_s_int(line: str):
+    """Integer value of the first S word on an M-code line, or None."""
+    for tok in line.split():
+        if tok[:1] == "S":
+            try:
+                return int(tok[1:])
+            except ValueError:
+                continue
+    return None
+
+
+def _first_s_float(line: str):
+    """Float value of the first S word on an M-code line, or None."""
+    for tok in line.split():
+        if tok[:1] == "S":
+            try:
+                return float(tok[1:])
+            except ValueError:
+                continue
+    return None
 
 
 def parse_gcode(
@@ -56,13 +49,26 @@ def parse_gcode(
     filament_diameter_mm: float,
     status_cb=None,
     status_every_lines: int = 0,
+    hasher=None,
 ):
+    """Parse an ASCII .gcode file into move dicts plus a layer->Z map.
+
+    Every move carries numeric (never None) `dist_mm`, `de_mm`, `time_s` and
+    `flow_mm3_s` — 0.0 when unknown — so downstream aggregation can index them
+    directly without None-coalescing. `speed_mm_s` and the fan/temperature
+    fields stay None until the file establishes them.
+
+    If `hasher` is given (e.g. `hashlib.sha256()`), the raw file bytes are fed
+    into it during the read loop, so callers that want a file digest don't have
+    to re-read the file afterwards.
+    """
     area = filament_area_mm2(filament_diameter_mm)
 
     # Position state
     x = y = z = 0.0
     e = 0.0
     feed_mm_min = None
+    feed_mm_s = None  # cached feed in mm/s; updated only when an F word appears
     e_relative = True  # honor M82/M83
 
     current_layer = 0
@@ -81,34 +87,54 @@ def parse_gcode(
 
     moves = []
 
-    re_type = re.compile(r";\s*TYPE:(.+)\s*$")
-    re_z = re.compile(r";\s*Z:([0-9.+-]+)")
-    re_layer = re.compile(r";\s*LAYER:\s*([0-9]+)")
-
-    re_g0g1 = re.compile(r"^(G0|G1)\s+(.*)$")
-    re_param = re.compile(r"([XYZEFS])([0-9.+-]+)")
-
-    with open(gcode_path, "r", encoding="utf-8", errors="replace") as f:
-        for i, line in enumerate(f, start=1):
-            if status_cb is not None and status_every_lines and (i % status_every_lines == 0):
-                status_cb(f"Parsed {i:,} lines")
-            line = line.rstrip("\n")
-
+    # Hoisted out of the loop: one check per line instead of two.
+    emit_every = status_every_lines if status_cb is not None else 0
+
+    # Bind the per-line bound methods once; attribute resolution inside the
+    # loop otherwise repeats for every line of the file.
+    type_search = _RE_TYPE.search
+    layer_search = _RE_LAYER.search
+    z_search = _RE_Z.search
+    g0g1_match = _RE_G0G1.match
+    param_findall = _RE_PARAM.findall
+    append_move = moves.append
+    sqrt = math.sqrt
+
+    # Slurp the file: one read feeds `hasher` in a single C call, one decode
+    # covers every line, and splitlines() strips the EOL markers for free.
+    # This trades holding the text in memory (the move dicts dwarf it anyway)
+    # for dropping three per-line calls from the hot loop; config.ini parsing
+    # takes the same approach.
+    with open(gcode_path, "rb") as f:
+        data = f.read()
+    if hasher is not None:
+        hasher.update(data)
+
+    for i, line in enumerate(data.decode("utf-8", errors="replace").splitlines(), start=1):
+        if emit_every and (i % emit_every == 0):
+            status_cb(f"Parsed {i:,} lines")
+
+        # Dispatch on content before running any regex: the slicer-comment
+        # patterns all require a ';' and the op-code handlers key off the
+        # first character, so the common move line pays no comment-regex
+        # scans at all. A G line carrying an inline ';TYPE:'/';Z:'/';LAYER:'
+        # comment is still routed through the comment branch first, exactly
+        # like the old unconditional search order.
+        if ";" in line:
             # Feature type
-            m = re_type.search(line)
+            m = type_search(line)
             if m:
                 current_type = m.group(1).strip()
                 continue
 
             # Layer markers
-            m = re_layer.search(line)
+            m = layer_search(line)
             if m:
                 saw_layer_tag = True
                 current_layer = int(m.group(1))
                 continue
 
-
-            m = re_z.search(line)
+            m = z_search(line)
             if m:
                 try:
                     zc = float(m.group(1))
@@ -126,6 +152,8 @@ def parse_gcode(
                 layer_z_map[current_layer] = zc
                 continue
 
+        c0 = line[:1]
+        if c0 == "M":
             # Extrusion mode
             if line.startswith("M82"):
                 e_relative = False
@@ -134,112 +162,129 @@ def parse_gcode(
                 e_relative = True
                 continue
 
-            # Fan
+            # Fan / temperatures: pull the S word with a token scan
+            # instead of a regex search over the whole line.
             if line.startswith("M106"):
-                ms = re.search(r"\bS(\d+)", line)
-                if ms:
-                    fan_s_0_255 = int(ms.group(1))
+                sv = _first_s_int(line)
+                if sv is not None:
+                    fan_s_0_255 = sv
                 continue
             if line.startswith("M107"):
                 fan_s_0_255 = 0
                 continue
 
-            # Temperatures
             if line.startswith(("M104", "M109")):
-                ms = re.search(r"\bS([0-9.+-]+)", line)
-                if ms:
-                    try:
-                        hotend_set = float(ms.group(1))
-                    except ValueError:
-                        pass
+                sv = _first_s_float(line)
+                if sv is not None:
+                    hotend_set = sv
                 continue
             if line.startswith(("M140", "M190")):
-                ms = re.search(r"\bS([0-9.+-]+)", line)
-                if ms:
-                    try:
-                        bed_set = float(ms.group(1))
-                    except ValueError:
-                        pass
+                sv = _first_s_float(line)
+                if sv is not None:
+                    bed_set = sv
                 continue
             if line.startswith("M141"):
-                ms = re.search(r"\bS([0-9.+-]+)", line)
-                if ms:
-                    try:
-                        chamber_set = float(ms.group(1))
-                    except ValueError:
-                        pass
+                sv = _first_s_float(line)
+                if sv is not None:
+                    chamber_set = sv
                 continue
+            continue
 
-            # Moves
-            mg = re_g0g1.match(line)
-            if not mg:
-                continue
-
-            cmd = mg.group(1)
-            rest = mg.group(2)
-            params = {k: float(v) for (k, v) in re_param.findall(rest)}
-
-            nx = params.get("X", x)
-            ny = params.get("Y", y)
-            nz = params.get("Z", z)
-
-            if "F" in params:
-                feed_mm_min = params["F"]
-            feed_mm_s = (feed_mm_min / 60.0) if (feed_mm_min and feed_mm_min > 0) else None
-
-            if "E" in params:
-                e_cmd = params["E"]
-                if e_relative:
-                    de = e_cmd
-                    ne = e + de
-                else:
-                    de = e_cmd - e
-                    ne = e_cmd
-            else:
-                de = 0.0
-                ne = e
-
-            dx = nx - x
-            dy = ny - y
-            dz = nz - z
-            dist = math.sqrt(dx * dx + dy * dy + dz * dz)
+        if c0 != "G":
+            continue
 
-            t_s = (dist / feed_mm_s) if (feed_mm_s and dist > 0) else 0.0
-            speed = feed_mm_s if feed_mm_s else None
+        # Moves
+        mg = g0g1_match(line)
+        if not mg:
+            continue
 
-            if t_s > 0 and de > 0:
-                vol_mm3 = de * area
-                flow = vol_mm3 / t_s
+        cmd = mg.group(1)
+        rest = mg.group(2)
+        # Token scan instead of a regex pass: parameters on slicer move lines
+        # are space-separated single-letter words, so first-char dispatch plus
+        # a direct float() covers virtually every token. The old regex only
+        # runs for the rare glued form ("X10Y20"). An inline ';' comment ends
+        # the parameter list (the regex used to happily pull "E3" out of
+        # comment text).
+        params = {}
+        for tok in rest.split():
+            c = tok[0]
+            if c in "XYZEFS":
+                try:
+                    params[c] = float(tok[1:])
+                    continue
+                except ValueError:
+                    pass
+                for k, v in param_findall(tok):
+                    try:
+                        params[k] = float(v)
+                    except ValueError:
+                        pass
+            elif c == ";":
+                break
+
+        nx = params.get("X", x)
+        ny = params.get("Y", y)
+        nz = params.get("Z", z)
+
+        if "F" in params:
+            feed_mm_min = params["F"]
+            feed_mm_s = (feed_mm_min / 60.0) if feed_mm_min > 0 else None
+
+        if "E" in params:
+            e_cmd = params["E"]
+            if e_relative:
+                de = e_cmd
+                ne = e + de
             else:
-                flow = 0.0
-
-            fan_pct = (fan_s_0_255 / 255.0 * 100.0) if fan_s_0_255 is not None else None
-
-            moves.append(
-                {
-                    "layer": current_layer,
-                    "z": nz,
-                    "type": current_type,
-                    "cmd": cmd,
-                    "x0": x,
-                    "y0": y,
-                    "z0": z,
-                    "x1": nx,
-                    "y1": ny,
-                    "z1": nz,
-                    "dist_mm": dist,
-                    "de_mm": de,
-                    "speed_mm_s": speed,
-                    "time_s": t_s,
-                    "flow_mm3_s": flow,
-                    "fan_pct": fan_pct,
-                    "hotend_C": hotend_set,
-                    "bed_C": bed_set,
-                    "chamber_C": chamber_set,
-                }
-            )
-
-            x, y, z, e = nx, ny, nz, ne
+                de = e_cmd - e
+                ne = e_cmd
+        else:
+            de = 0.0
+            ne = e
+
+        dx = nx - x
+        dy = ny - y
+        dz = nz - z
+        # Fast path: pure E/F moves (retracts, feed changes) have no travel.
+        dist = sqrt(dx * dx + dy * dy + dz * dz) if (dx or dy or dz) else 0.0
+
+        t_s = (dist / feed_mm_s) if (feed_mm_s and dist > 0) else 0.0
+        speed = feed_mm_s if feed_mm_s else None
+
+        if t_s > 0 and de > 0:
+            vol_mm3 = de * area
+            flow = vol_mm3 / t_s
+        else:
+            flow = 0.0
+
+        fan_pct = (fan_s_0_255 / 255.0 * 100.0) if fan_s_0_255 is not None else None
+
+        append_move(
+            {
+                "layer": current_layer,
+                "z": nz,
+                "type": current_type,
+                "cmd": cmd,
+                "x0": x,
+                "y0": y,
+                "z0": z,
+                "x1": nx,
+                "y1": ny,
+                "z1": nz,
+                "dist_mm": dist,
+                "de_mm": de,
+                "speed_mm_s": speed,
+                "time_s": t_s,
+                "flow_mm3_s": flow,
+                "fan_pct": fan_pct,
+                "hotend_C": hotend_set,
+                "bed_C": bed_set,
+                "chamber_C": chamber_set,
+            }
+        )
+
+        x, y, z, e = nx, ny, nz, ne
 
     return moves, layer_z_map
 
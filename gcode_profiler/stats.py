@@ -1,4 +1,6 @@
+import bisect
 import math
+from itertools import accumulate
 
 def weighted_quantile(values, weights, q: float):
     """Compute a weighted quantile.
@@ -18,16 +20,48 @@ def weighted_quantile(values, weights, q: float):
     if not pairs:
         return None
     pairs.sort(key=lambda x: x[0])
-    total_w = sum(w for _, w in pairs)
+    # Accumulate in C and binary-search the cutoff instead of walking the
+    # pairs with a Python loop; same first-cum->=cutoff semantics.
+    cum = list(accumulate(w for _, w in pairs))
+    total_w = cum[-1]
     if total_w <= 0:
         return None
-    cutoff = q * total_w
-    acc = 0.0
-    for v, w in pairs:
-        acc += w
-        if acc >= cutoff:
-            return v
-    return pairs[-1][0]
+    i = bisect.bisect_left(cum, q * total_w)
+    return pairs[min(i, len(pairs) - 1)][0]
+
+
+def weighted_quantiles(values, weights, qs):
+    """Compute several weighted quantiles from one sorted pass.
+
+    Same semantics as calling `weighted_quantile` once per q, but the data is
+    sorted and the weights accumulated only once; each q is then a binary
+    search into the cumulative weights. Returns a list aligned with `qs`
+    (all None when there is no usable data).
+    """
+    if not values:
+        return [None] * len(qs)
+    if weights is None:
+        weights = [1.0] * len(values)
+    if len(values) != len(weights):
+        raise ValueError("values and weights must be same length")
+
+    pairs = [(float(v), float(w)) for v, w in zip(values, weights) if v is not None and w is not None and w > 0]
+    if not pairs:
+        return [None] * len(qs)
+    pairs.sort(key=lambda x: x[0])
+    vs = [v for v, _ in pairs]
+    cum = list(accumulate(w for _, w in pairs))
+    total_w = cum[-1]
+    if total_w <= 0:
+        return [None] * len(qs)
+
+    out = []
+    last = len(vs) - 1
+    for q in qs:
+        q = max(0.0, min(1.0, float(q)))
+        i = bisect.bisect_left(cum, q * total_w)
+        out.append(vs[min(i, last)])
+    return out
 
 
 def make_bins(min_v: float, max_v: float, bins: int):
@@ -48,29 +82,27 @@ def make_bins(min_v: float, max_v: float, bins: int):
 
 
 def bin_counts(values, bins_spec):
-    """Return counts per bin. bins_spec is list[(lo, hi)], inclusive lo, exclusive hi except last."""
+    """Return counts per bin. bins_spec is list[(lo, hi)], inclusive lo, exclusive hi except last.
+
+    Bins are assumed contiguous and ascending, as produced by make_bins;
+    out-of-range values are clamped into the first/last bin.
+    """
     counts = [0] * len(bins_spec)
     if not bins_spec:
         return counts
+    # One binary search per value against the shared bin edges, instead of a
+    # linear scan over the bins for every value.
+    edges = [lo for lo, _ in bins_spec]
+    edges.append(bins_spec[-1][1])
+    last = len(counts) - 1
     for v in values:
         if v is None:
             continue
-        placed = False
-        for i, (lo, hi) in enumerate(bins_spec):
-            if i < len(bins_spec) - 1:
-                if lo <= v < hi:
-                    counts[i] += 1
-                    placed = True
-                    break
-            else:
-                if lo <= v <= hi:
-                    counts[i] += 1
-                    placed = True
-                    break
-        if not placed:
-            if v < bins_spec[0][0]:
-                counts[0] += 1
-            else:
-                counts[-1] += 1
+        i = bisect.bisect_right(edges, v) - 1
+        if i < 0:
+            i = 0
+        elif i > last:
+            i = last
+        counts[i] += 1
     return counts
 
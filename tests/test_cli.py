@@ -0,0 +1,16 @@
+import hashlib
+
+from gcode_profiler.cli import sha256_file
+
+
+def test_sha256_file_matches_hashlib(tmp_path):
+    p = tmp_path / "config.ini"
+    p.write_bytes(b"max_print_speed = 200\n" * 100)
+    assert sha256_file(str(p)) == hashlib.sha256(p.read_bytes()).hexdigest()
+
+
+def test_sha256_file_empty_file(tmp_path):
+    # Empty files can't be mmapped; the chunked fallback must handle them.
+    p = tmp_path / "empty.ini"
+    p.write_bytes(b"")
+    assert sha256_file(str(p)) == hashlib.sha256(b"").hexdigest()
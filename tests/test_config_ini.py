@@ -18,3 +18,20 @@ max_print_speed = 200
     assert cfg["filament_diameter"] == "1.75"
     assert config_get_float(cfg, "filament_diameter") == 1.75
     assert config_get_float(cfg, "max_print_speed") == 200.0
+
+
+def test_parse_config_ini_cached(tmp_path, monkeypatch):
+    from gcode_profiler import config_ini
+
+    monkeypatch.setattr(config_ini, "_CACHE_DIR", tmp_path / "cache")
+
+    p = tmp_path / "config.ini"
+    p.write_text("max_print_speed = 200\n", encoding="utf-8")
+
+    cold = config_ini.parse_config_ini_cached(str(p))
+    warm = config_ini.parse_config_ini_cached(str(p))
+    assert cold == warm == {"max_print_speed": "200"}
+
+    # Editing the file must invalidate the cache entry
+    p.write_text("max_print_speed = 300\n", encoding="utf-8")
+    assert config_ini.parse_config_ini_cached(str(p)) == {"max_print_speed": "300"}
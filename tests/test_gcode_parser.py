@@ -27,3 +27,15 @@ G1 X20 Y0 E2.0 F2400
     assert 1 in layer_z_map
     # at least one extruding move with positive flow
     assert any((m.get("flow_mm3_s") or 0) > 0 for m in moves)
+
+
+def test_parse_gcode_feeds_hasher_full_file(tmp_path):
+    import hashlib
+
+    gcode = tmp_path / "sample.gcode"
+    gcode.write_text("M83\n;Z:0.2\nG1 X10 Y0 E1.0 F1200\n", encoding="utf-8")
+
+    # The optional hasher must see exactly the file bytes (no second read pass).
+    h = hashlib.sha256()
+    parse_gcode(str(gcode), 1.75, hasher=h)
+    assert h.hexdigest() == hashlib.sha256(gcode.read_bytes()).hexdigest()
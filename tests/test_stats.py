@@ -1,4 +1,4 @@
-from gcode_profiler.stats import weighted_quantile, make_bins, bin_counts
+from gcode_profiler.stats import weighted_quantile, weighted_quantiles, make_bins, bin_counts
 
 
 def test_weighted_quantile_basic():
@@ -18,6 +18,17 @@ def test_weighted_quantile_weighted_bias():
     assert weighted_quantile(vals, w, 0.5) == 0.0
 
 
+def test_weighted_quantiles_matches_single_calls():
+    vals = [5.0, 1.0, 3.0, 2.0, 4.0]
+    w = [1.0, 2.0, 0.5, 3.0, 1.5]
+    qs = (0.0, 0.5, 0.95, 0.99, 1.0)
+    assert weighted_quantiles(vals, w, qs) == [weighted_quantile(vals, w, q) for q in qs]
+
+
+def test_weighted_quantiles_empty():
+    assert weighted_quantiles([], [], (0.95, 0.99)) == [None, None]
+
+
 def test_bins_and_counts():
     bins_spec = make_bins(0.0, 10.0, 5)
     assert len(bins_spec) == 5